@@ -0,0 +1,534 @@
+# bitboard.py
+
+# A faster way to store a chess position.
+# Instead of an 8x8 grid of strings, every (color, piece type) pair gets one
+# 64-bit integer. Bit number `sq` is set when that piece stands on square `sq`.
+#
+# Squares are numbered in the same order as the `board` grid in chess.py:
+#   sq = row * 8 + col   ->   a8 is 0, h8 is 7, a1 is 56, h1 is 63
+# so (row, col) pairs from the UI convert with a single multiply.
+
+import zobrist
+from zobrist import PIECE_KEYS, CASTLE_KEYS, EP_KEYS
+from pst import MG_TABLE, EG_TABLE, PHASE_TABLE
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+EMPTY = -1
+PIECE_LETTERS = "pnbrqk"
+COLOR_LETTERS = "wb"
+FULL = (1 << 64) - 1
+
+# Castling rights are stored as bit flags
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+# -----------------------------------
+# Bit Helpers
+# -----------------------------------
+
+def square(row, col):
+    return row * 8 + col
+
+
+def lsb(b):
+    # Index of the lowest set bit
+    return (b & -b).bit_length() - 1
+
+
+def msb(b):
+    # Index of the highest set bit
+    return b.bit_length() - 1
+
+
+def iter_bits(b):
+    while b:
+        low = b & -b
+        yield low.bit_length() - 1
+        b ^= low
+
+
+def piece_code(color, p_type):
+    # One number per (color, type): white pawn = 0 ... black king = 11
+    return color * 6 + p_type
+
+
+# A move is packed into one int: from square, to square and promotion piece
+#   bits 0-5: from   bits 6-11: to   bits 12-14: promotion type (0 = none)
+def encode_move(frm, to, promo=0):
+    return frm | (to << 6) | (promo << 12)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promo(move):
+    return move >> 12
+
+
+# -----------------------------------
+# Precomputed Attack Tables
+# -----------------------------------
+
+def _leaper_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        b = 0
+        for dr, dc in offsets:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < 8 and 0 <= nc < 8:
+                b |= 1 << square(nr, nc)
+        table.append(b)
+    return table
+
+
+def _ray_table(dr, dc):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        b = 0
+        r, c = r + dr, c + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            b |= 1 << square(r, c)
+            r, c = r + dr, c + dc
+        table.append(b)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table([(2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1)])
+KING_ATTACKS = _leaper_table([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+
+# White pawns move up the grid (row - 1), black pawns move down (row + 1)
+PAWN_ATTACKS = [
+    _leaper_table([(-1, -1), (-1, 1)]),
+    _leaper_table([(1, -1), (1, 1)]),
+]
+
+# Each ray is stored with a flag telling whether it runs towards higher
+# square numbers. The first blocker on the ray is then the lowest or the
+# highest set bit of (ray & occupied).
+ROOK_RAYS = [(_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]]
+BISHOP_RAYS = [(_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in [(-1, -1), (-1, 1), (1, -1), (1, 1)]]
+
+
+def _slide(rays, sq, occupied):
+    attacks = 0
+    for table, forward in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            first = lsb(blockers) if forward else msb(blockers)
+            # Everything past the first blocker is hidden behind it
+            ray ^= table[first]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slide(ROOK_RAYS, sq, occupied)
+
+
+def bishop_attacks(sq, occupied):
+    return _slide(BISHOP_RAYS, sq, occupied)
+
+
+def queen_attacks(sq, occupied):
+    return _slide(ROOK_RAYS, sq, occupied) | _slide(BISHOP_RAYS, sq, occupied)
+
+
+# Every square on a line (rank, file or diagonal) through `sq`, on an empty board.
+# A piece off these lines can never be pinned to a king on `sq`.
+QUEEN_LINES = [queen_attacks(sq, 0) for sq in range(64)]
+
+FILE_A = sum(1 << square(r, 0) for r in range(8))
+FILE_H = sum(1 << square(r, 7) for r in range(8))
+
+
+def pawn_attack_map(pawns, color):
+    # All squares attacked by a set of pawns at once, using shifts instead of a loop
+    if color == WHITE:
+        return ((pawns >> 9) & ~FILE_H) | ((pawns >> 7) & ~FILE_A)
+    return ((pawns << 7) & ~FILE_H & FULL) | ((pawns << 9) & ~FILE_A & FULL)
+
+
+# A move touching one of these squares (king or rook start) removes castling rights
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[square(7, 4)] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLE_MASK[square(7, 7)] &= ~WHITE_KINGSIDE
+CASTLE_MASK[square(7, 0)] &= ~WHITE_QUEENSIDE
+CASTLE_MASK[square(0, 4)] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLE_MASK[square(0, 7)] &= ~BLACK_KINGSIDE
+CASTLE_MASK[square(0, 0)] &= ~BLACK_QUEENSIDE
+
+# Rights flag for each castle, plus the columns that must be empty / not attacked
+CASTLE_RIGHTS = {
+    (WHITE, "king"): WHITE_KINGSIDE, (WHITE, "queen"): WHITE_QUEENSIDE,
+    (BLACK, "king"): BLACK_KINGSIDE, (BLACK, "queen"): BLACK_QUEENSIDE,
+}
+CASTLE_EMPTY = {"king": [5, 6], "queen": [1, 2, 3]}
+CASTLE_SAFE = {"king": [5, 6], "queen": [2, 3]}
+
+# A draw can be claimed once halfmove_clock reaches this (50 moves by each side)
+FIFTY_MOVE_PLIES = 100
+
+
+# -----------------------------------
+# Position
+# -----------------------------------
+
+class Position:
+    """One chess position: 12 bitboards plus a square -> piece lookup."""
+
+    def __init__(self):
+        self.bb = [0] * 12
+        self.occupied = [0, 0]
+        self.mailbox = [EMPTY] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.ep_square = None
+        # Moves since the last capture or pawn move, and the move number shown in FEN
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        # Zobrist key, updated by put()/remove() and make()/unmake()
+        self.key = 0
+        # Piece-square sums (white minus black) and game phase for the evaluation,
+        # also kept up to date by put()/remove(); see pst.py
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+        # King squares are tracked by put()/remove(), so no search is ever needed
+        self.kings = [None, None]
+        # Squares attacked by each side; filled in lazily by attack_map() and
+        # dropped on every make(), unmake() restores the previous maps
+        self.attacks = [None, None]
+        # Undo records for unmake(), one per move made
+        self.undo_stack = []
+
+    def copy(self):
+        other = Position.__new__(Position)
+        other.bb = self.bb[:]
+        other.occupied = self.occupied[:]
+        other.mailbox = self.mailbox[:]
+        other.turn = self.turn
+        other.castling = self.castling
+        other.ep_square = self.ep_square
+        other.halfmove_clock = self.halfmove_clock
+        other.fullmove_number = self.fullmove_number
+        other.key = self.key
+        other.mg = self.mg
+        other.eg = self.eg
+        other.phase = self.phase
+        other.kings = self.kings[:]
+        other.attacks = self.attacks[:]
+        other.undo_stack = self.undo_stack[:]
+        return other
+
+    @classmethod
+    def from_fen(cls, fen=START_FEN):
+        """Builds a position from a FEN string such as START_FEN."""
+        fields = fen.split()
+        if len(fields) not in (4, 5, 6):
+            raise ValueError(f"FEN needs 4 to 6 fields: {fen!r}")
+        pos = cls()
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError(f"FEN needs 8 rows: {fen!r}")
+        for r, row in enumerate(rows):
+            c = 0
+            for ch in row:
+                if ch.isdigit():
+                    c += int(ch)
+                else:
+                    if c > 7 or ch.lower() not in PIECE_LETTERS:
+                        raise ValueError(f"Bad FEN row {row!r}")
+                    pos.put(WHITE if ch.isupper() else BLACK, PIECE_LETTERS.index(ch.lower()), square(r, c))
+                    c += 1
+            if c != 8:
+                raise ValueError(f"Bad FEN row {row!r}")
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"Bad FEN side to move {fields[1]!r}")
+        pos.turn = WHITE if fields[1] == "w" else BLACK
+        castling = fields[2]
+        if castling != "-" and (set(castling) - set("KQkq") or len(set(castling)) != len(castling)):
+            raise ValueError(f"Bad FEN castling rights {castling!r}")
+        for ch, flag in zip("KQkq", (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)):
+            if ch in castling:
+                pos.castling |= flag
+        ep = fields[3]
+        if ep != "-":
+            if len(ep) != 2 or ep[0] not in "abcdefgh" or ep[1] not in "36":
+                raise ValueError(f"Bad FEN en passant square {ep!r}")
+            pos.ep_square = square(8 - int(ep[1]), "abcdefgh".index(ep[0]))
+        for name, value in zip(("halfmove_clock", "fullmove_number"), fields[4:]):
+            if not value.isdecimal():
+                raise ValueError(f"Bad FEN move counter {value!r}")
+            setattr(pos, name, int(value))
+        pos.key = pos.compute_key()
+        return pos
+
+    def to_board(self):
+        """Returns the position as the chess.py string grid."""
+        board = [[".."] * 8 for _ in range(8)]
+        for sq, code in enumerate(self.mailbox):
+            if code != EMPTY:
+                board[sq // 8][sq % 8] = COLOR_LETTERS[code // 6] + PIECE_LETTERS[code % 6]
+        return board
+
+    def put(self, color, p_type, sq):
+        code = piece_code(color, p_type)
+        self.bb[code] |= 1 << sq
+        self.occupied[color] |= 1 << sq
+        self.mailbox[sq] = code
+        self.key ^= PIECE_KEYS[code][sq]
+        self.mg += MG_TABLE[code][sq]
+        self.eg += EG_TABLE[code][sq]
+        self.phase += PHASE_TABLE[code]
+        if p_type == KING:
+            self.kings[color] = sq
+
+    def remove(self, sq):
+        code = self.mailbox[sq]
+        self.bb[code] &= ~(1 << sq)
+        self.occupied[code // 6] &= ~(1 << sq)
+        self.mailbox[sq] = EMPTY
+        self.key ^= PIECE_KEYS[code][sq]
+        self.mg -= MG_TABLE[code][sq]
+        self.eg -= EG_TABLE[code][sq]
+        self.phase -= PHASE_TABLE[code]
+        if code % 6 == KING:
+            self.kings[code // 6] = None
+        return code
+
+    def ep_key(self):
+        # The en passant file only counts when a pawn of the side to move can
+        # really capture there (the Polyglot rule), so identical positions hash alike
+        ep = self.ep_square
+        if ep is not None and PAWN_ATTACKS[self.turn ^ 1][ep] & self.bb[self.turn * 6 + PAWN]:
+            return EP_KEYS[ep % 8]
+        return 0
+
+    def compute_key(self):
+        """Zobrist key built from scratch; make()/unmake() keep self.key equal to this."""
+        key = 0
+        for sq, code in enumerate(self.mailbox):
+            if code != EMPTY:
+                key ^= PIECE_KEYS[code][sq]
+        key ^= CASTLE_KEYS[self.castling] ^ self.ep_key()
+        if self.turn == WHITE:
+            key ^= zobrist.TURN_KEY
+        return key
+
+    def all_occupied(self):
+        return self.occupied[WHITE] | self.occupied[BLACK]
+
+    # -------- Attacks --------
+
+    def attackers(self, sq, by_color, occupied=None, mask=FULL):
+        """Bitboard of `by_color` pieces attacking `sq`."""
+        if occupied is None:
+            occupied = self.all_occupied()
+        bb = self.bb
+        base = by_color * 6
+        diagonal = bb[base + BISHOP] | bb[base + QUEEN]
+        straight = bb[base + ROOK] | bb[base + QUEEN]
+        found = (PAWN_ATTACKS[by_color ^ 1][sq] & bb[base + PAWN]) \
+            | (KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]) \
+            | (KING_ATTACKS[sq] & bb[base + KING])
+        if diagonal:
+            found |= bishop_attacks(sq, occupied) & diagonal
+        if straight:
+            found |= rook_attacks(sq, occupied) & straight
+        return found & mask
+
+    def attack_map(self, color):
+        """Bitboard of every square attacked by `color`, computed once per position."""
+        found = self.attacks[color]
+        if found is not None:
+            return found
+
+        bb = self.bb
+        base = color * 6
+        occupied = self.all_occupied()
+        found = pawn_attack_map(bb[base + PAWN], color)
+        for sq in iter_bits(bb[base + KNIGHT]):
+            found |= KNIGHT_ATTACKS[sq]
+        for sq in iter_bits(bb[base + BISHOP] | bb[base + QUEEN]):
+            found |= bishop_attacks(sq, occupied)
+        for sq in iter_bits(bb[base + ROOK] | bb[base + QUEEN]):
+            found |= rook_attacks(sq, occupied)
+        king = self.kings[color]
+        if king is not None:
+            found |= KING_ATTACKS[king]
+        self.attacks[color] = found
+        return found
+
+    def is_attacked(self, sq, by_color):
+        return self.attack_map(by_color) >> sq & 1 == 1
+
+    def in_check(self, color=None):
+        if color is None:
+            color = self.turn
+        king = self.kings[color]
+        if king is None:
+            return False
+        return self.attack_map(color ^ 1) >> king & 1 == 1
+
+    # -------- Move Validation --------
+
+    def can_castle(self, color, side):
+        if not self.castling & CASTLE_RIGHTS[(color, side)]:
+            return False
+        row = 7 if color == WHITE else 0
+        rook_col = 7 if side == "king" else 0
+        if self.mailbox[square(row, rook_col)] != piece_code(color, ROOK):
+            return False
+        if self.mailbox[square(row, 4)] != piece_code(color, KING):
+            return False
+        occupied = self.all_occupied()
+        for c in CASTLE_EMPTY[side]:
+            if occupied >> square(row, c) & 1:
+                return False
+        if self.in_check(color):
+            return False
+        for c in CASTLE_SAFE[side]:
+            if self.is_attacked(square(row, c), color ^ 1):
+                return False
+        return True
+
+    def targets(self, sq):
+        """Pseudo-legal destination squares for the piece on `sq` (own king safety ignored)."""
+        code = self.mailbox[sq]
+        if code == EMPTY:
+            return 0
+        color, p_type = divmod(code, 6)
+        own = self.occupied[color]
+        occupied = self.all_occupied()
+
+        if p_type == PAWN:
+            enemy = self.occupied[color ^ 1]
+            if self.ep_square is not None and color == self.turn:
+                enemy |= 1 << self.ep_square
+            found = PAWN_ATTACKS[color][sq] & enemy
+            step = -8 if color == WHITE else 8
+            one = sq + step
+            if 0 <= one < 64 and not occupied >> one & 1:
+                found |= 1 << one
+                start_row = 6 if color == WHITE else 1
+                if sq // 8 == start_row and not occupied >> (one + step) & 1:
+                    found |= 1 << (one + step)
+            return found
+        if p_type == KNIGHT:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if p_type == BISHOP:
+            return bishop_attacks(sq, occupied) & ~own
+        if p_type == ROOK:
+            return rook_attacks(sq, occupied) & ~own
+        if p_type == QUEEN:
+            return queen_attacks(sq, occupied) & ~own
+
+        found = KING_ATTACKS[sq] & ~own
+        for side, col in [("king", 6), ("queen", 2)]:
+            if sq == square(7 if color == WHITE else 0, 4) and self.can_castle(color, side):
+                found |= 1 << (sq - 4 + col)
+        return found
+
+    def is_safe_after(self, frm, to):
+        """True if moving frm -> to does not leave the mover's own king attacked."""
+        code = self.mailbox[frm]
+        color, p_type = divmod(code, 6)
+        king = to if p_type == KING else self.kings[color]
+        if king is None:
+            return True
+        if p_type == KING:
+            # Castling already checked the squares it passes; a plain king step
+            # is safe unless the target is attacked with the king lifted off its square
+            if abs(to - frm) == 2:
+                return True
+        elif to != self.ep_square and not QUEEN_LINES[king] >> frm & 1 and not self.in_check(color):
+            # Not in check and not on a line through the king: the move cannot expose it
+            return True
+
+        removed = 1 << to
+        if p_type == PAWN and to == self.ep_square:
+            # The pawn taken en passant stands beside the capturing pawn
+            removed = 1 << (frm - frm % 8 + to % 8)
+        occupied = (self.all_occupied() & ~(1 << frm) & ~removed) | (1 << to)
+        return not self.attackers(king, color ^ 1, occupied, FULL & ~removed)
+
+    def reversible_keys(self):
+        """Keys of the earlier positions that could still repeat: those since the last capture or pawn move."""
+        if self.halfmove_clock == 0:
+            return []
+        return [undo[7] for undo in self.undo_stack[-self.halfmove_clock:]]
+
+    # -------- Make / Unmake --------
+
+    def make(self, move):
+        """Plays a move (assumed legal) and records what unmake() needs to take it back."""
+        frm, to, promo = move & 63, (move >> 6) & 63, move >> 12
+        code = self.mailbox[frm]
+        color, p_type = divmod(code, 6)
+
+        cap_sq = to
+        if p_type == PAWN and to == self.ep_square:
+            cap_sq = frm - frm % 8 + to % 8
+        captured = self.mailbox[cap_sq]
+        self.undo_stack.append((move, captured, cap_sq, self.castling, self.ep_square, self.attacks,
+                                self.halfmove_clock, self.key))
+        self.key ^= self.ep_key() ^ CASTLE_KEYS[self.castling] ^ zobrist.TURN_KEY
+        self.attacks = [None, None]
+        if p_type == PAWN or captured != EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if color == BLACK:
+            self.fullmove_number += 1
+
+        if captured != EMPTY:
+            self.remove(cap_sq)
+        self.remove(frm)
+        self.put(color, promo or p_type, to)
+
+        if p_type == KING and abs(to - frm) == 2:
+            rook_from, rook_to = (to + 1, to - 1) if to > frm else (to - 2, to + 1)
+            self.remove(rook_from)
+            self.put(color, ROOK, rook_to)
+
+        self.castling &= CASTLE_MASK[frm] & CASTLE_MASK[to]
+        self.ep_square = (frm + to) // 2 if p_type == PAWN and abs(to - frm) == 16 else None
+        self.turn ^= 1
+        self.key ^= CASTLE_KEYS[self.castling] ^ self.ep_key()
+
+    def unmake(self):
+        move, captured, cap_sq, castling, ep_square, attacks, halfmove_clock, key = self.undo_stack.pop()
+        frm, to, promo = move & 63, (move >> 6) & 63, move >> 12
+        self.turn ^= 1
+        color = self.turn
+        if color == BLACK:
+            self.fullmove_number -= 1
+
+        p_type = PAWN if promo else self.mailbox[to] % 6
+        self.remove(to)
+        self.put(color, p_type, frm)
+
+        if p_type == KING and abs(to - frm) == 2:
+            rook_from, rook_to = (to + 1, to - 1) if to > frm else (to - 2, to + 1)
+            self.remove(rook_to)
+            self.put(color, ROOK, rook_from)
+
+        if captured != EMPTY:
+            self.put(captured // 6, captured % 6, cap_sq)
+        self.castling = castling
+        self.ep_square = ep_square
+        self.attacks = attacks
+        self.halfmove_clock = halfmove_clock
+        self.key = key
@@ -0,0 +1,380 @@
+# engine.py
+
+# Computer opponent: alpha-beta search with iterative deepening.
+#
+#  - Iterative deepening searches depth 1, 2, 3, ... until the time budget
+#    runs out; the best move of each finished depth is tried first in the
+#    next one, which makes the deeper searches much cheaper.
+#  - Move ordering: transposition-table move, then captures by MVV-LVA
+#    (most valuable victim, least valuable attacker), then killer moves
+#    (quiet moves that caused a cutoff at the same ply), then quiet moves
+#    by history score.
+#  - The evaluation is material plus piece-square tables, blended between
+#    middlegame and endgame values (pst.py). The sums it needs are kept up
+#    to date by make()/unmake(), so evaluating costs a few arithmetic ops.
+#  - Quiescence search keeps following captures at the leaves so the
+#    engine never stops counting in the middle of an exchange.
+#  - Repetitions and the fifty-move rule score as draws. `seen` counts the
+#    positions of the game so far plus the current search path, so spotting
+#    a repetition is one dictionary lookup. Scoring them 0 makes the engine
+#    steer away from repeating when ahead and towards it when behind.
+#
+# EngineThread runs a search in the background so the pgzero update/draw
+# loop keeps running while the engine thinks.
+
+import threading
+import time
+
+from bitboard import PAWN, EMPTY, WHITE, FIFTY_MOVE_PLIES
+from movegen import generate_moves, legal_moves
+from pst import MAX_PHASE, blend, full_scores
+from transposition import (TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER,
+                           LEGAL_HAS_MOVES, LEGAL_CHECKMATE, LEGAL_STALEMATE)
+
+MATE = 30000
+MATE_BOUND = MATE - 1000  # scores beyond this are "mate in N"
+INFINITE = MATE + 1
+MAX_PLY = 64
+
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+
+
+def evaluate(pos):
+    """Tapered material + piece-square score from the side to move's point of view."""
+    phase = pos.phase if pos.phase < MAX_PHASE else MAX_PHASE
+    score = (pos.mg * phase + pos.eg * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if pos.turn == WHITE else -score
+
+
+def evaluate_full(pos):
+    """The same score as evaluate(), added up from all 64 squares (for checking and benchmarks)."""
+    score = blend(*full_scores(pos.mailbox))
+    return score if pos.turn == WHITE else -score
+
+
+def time_budget(remaining, increment=0.0, moves_to_go=None):
+    """Seconds to spend on one move given the clock (e.g. white_time / black_time)."""
+    if remaining <= 0:
+        return 0.01
+    moves = moves_to_go or 30
+    budget = remaining / moves + increment * 0.8
+    # Never bet more than a quarter of what is left on a single move
+    return max(0.01, min(budget, remaining / 4))
+
+
+class SearchStopped(Exception):
+    pass
+
+
+class Searcher:
+    """Alpha-beta searcher. One instance keeps its table, killers and history between moves."""
+
+    def __init__(self, table=None, tablebase=None):
+        self.table = table or TranspositionTable(16)
+        # Optional tablebase.EndgameTables: exact results once three pieces are left
+        self.tablebase = tablebase
+        self.evaluate = evaluate
+        self.stop_flag = False
+        self.nodes = 0
+        # Zobrist key -> occurrences, for the game history and the moves above the current node
+        self.seen = {}
+        self.reset_heuristics()
+
+    def reset_heuristics(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        # history[color][from * 64 + to] grows every time a quiet move causes a cutoff
+        self.history = [[0] * 4096, [0] * 4096]
+
+    def stop(self):
+        self.stop_flag = True
+
+    # -------- Driver --------
+
+    def search(self, pos, max_depth=MAX_PLY, time_limit=None, node_limit=None, on_iteration=None):
+        """Iterative deepening. Returns (best move, score, depth reached).
+
+        `on_iteration(depth, score, move, nodes, seconds)` is called after every finished depth.
+        """
+        self.stop_flag = False
+        self.nodes = 0
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + time_limit if time_limit else None
+        self.node_limit = node_limit
+        self.table.new_search()
+        self.reset_heuristics()
+        # Only positions since the last capture or pawn move can come back
+        self.seen = {}
+        for key in pos.reversible_keys() + [pos.key]:
+            self.seen[key] = self.seen.get(key, 0) + 1
+
+        root_moves = legal_moves(pos)
+        if not root_moves:
+            return 0, (-MATE if pos.in_check() else 0), 0
+        if self.tablebase is not None:
+            found = self.tablebase.probe(pos)
+            move = self.tablebase.best_move(pos) if found else None
+            if move is not None:
+                return move, tablebase_score(found, 0), 0
+        best_move, best_score, reached = root_moves[0], 0, 0
+        root_height = len(pos.undo_stack)
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self.search_root(pos, root_moves, depth, best_move)
+            except SearchStopped:
+                # Take back the moves that were on the board when the search was cut off
+                while len(pos.undo_stack) > root_height:
+                    pos.unmake()
+                break
+            best_move, best_score, reached = move, score, depth
+            if on_iteration:
+                on_iteration(depth, score, move, self.nodes, time.perf_counter() - self.start_time)
+            if abs(score) >= MATE_BOUND or len(root_moves) == 1:
+                break
+            # A new depth costs more than all the previous ones; skip it when it cannot finish
+            if self.deadline and time.perf_counter() - self.start_time > (self.deadline - self.start_time) / 2:
+                break
+        return best_move, best_score, reached
+
+    def search_root(self, pos, root_moves, depth, first):
+        alpha, beta = -INFINITE, INFINITE
+        root_moves.sort(key=lambda m: m != first)
+        best_move = root_moves[0]
+        for move in root_moves:
+            pos.make(move)
+            score = -self.alpha_beta(pos, depth - 1, -beta, -alpha, 1)
+            pos.unmake()
+            if score > alpha:
+                alpha, best_move = score, move
+        self.table.store(pos.key, best_move, alpha, depth, BOUND_EXACT, LEGAL_HAS_MOVES)
+        return alpha, best_move
+
+    def check_limits(self):
+        if self.stop_flag:
+            raise SearchStopped
+        if self.deadline and time.perf_counter() > self.deadline:
+            raise SearchStopped
+        if self.node_limit and self.nodes >= self.node_limit:
+            raise SearchStopped
+
+    # -------- Alpha-Beta --------
+
+    def alpha_beta(self, pos, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+
+        in_check = pos.in_check()
+        # A position seen before is a draw by repetition, as far as the search cares.
+        # A mate on the hundredth ply still counts, so positions in check are searched normally.
+        if pos.key in self.seen or (pos.halfmove_clock >= FIFTY_MOVE_PLIES and not in_check):
+            return 0
+        if in_check:
+            depth += 1  # check extension: never stop searching right after a check
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(pos, alpha, beta, ply)
+
+        if self.tablebase is not None and (pos.occupied[0] | pos.occupied[1]).bit_count() <= 3:
+            found = self.tablebase.probe(pos)
+            if found is not None:
+                return tablebase_score(found, ply)
+
+        original_alpha = alpha
+        entry = self.table.probe(pos.key)
+        tt_move = 0
+        if entry is not None:
+            if entry.legal == LEGAL_CHECKMATE:
+                return -MATE + ply
+            if entry.legal == LEGAL_STALEMATE:
+                return 0
+            tt_move = entry.move
+            if entry.depth >= depth and entry.bound:
+                score = score_from_table(entry.score, ply)
+                if entry.bound == BOUND_EXACT:
+                    return score
+                if entry.bound == BOUND_LOWER and score >= beta:
+                    return score
+                if entry.bound == BOUND_UPPER and score <= alpha:
+                    return score
+
+        moves = legal_moves(pos)
+        if not moves:
+            status = LEGAL_CHECKMATE if in_check else LEGAL_STALEMATE
+            self.table.store_legality(pos.key, status)
+            return -MATE + ply if in_check else 0
+
+        best_score, best_move = -INFINITE, moves[0]
+        seen = self.seen
+        seen[pos.key] = seen.get(pos.key, 0) + 1
+        for move in self.order_moves(pos, moves, tt_move, ply):
+            pos.make(move)
+            score = -self.alpha_beta(pos, depth - 1, -beta, -alpha, ply + 1)
+            pos.unmake()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not self.is_capture(pos, move):
+                            self.remember_cutoff(pos.turn, move, depth, ply)
+                        break
+        if seen[pos.key] == 1:
+            del seen[pos.key]
+        else:
+            seen[pos.key] -= 1
+
+        if best_score <= original_alpha:
+            bound = BOUND_UPPER
+        elif best_score >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        self.table.store(pos.key, best_move, score_to_table(best_score, ply), depth, bound, LEGAL_HAS_MOVES)
+        return best_score
+
+    def quiescence(self, pos, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+
+        stand_pat = self.evaluate(pos)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        if ply >= MAX_PLY:
+            return stand_pat
+
+        captures = [m for m in generate_moves(pos) if self.is_capture(pos, m) or m >> 12]
+        captures.sort(key=lambda m: self.mvv_lva(pos, m), reverse=True)
+        for move in captures:
+            if not pos.is_safe_after(move & 63, (move >> 6) & 63):
+                continue
+            pos.make(move)
+            score = -self.quiescence(pos, -beta, -alpha, ply + 1)
+            pos.unmake()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    # -------- Move Ordering --------
+
+    def is_capture(self, pos, move):
+        to = (move >> 6) & 63
+        if pos.mailbox[to] != EMPTY:
+            return True
+        return to == pos.ep_square and pos.mailbox[move & 63] % 6 == PAWN
+
+    def mvv_lva(self, pos, move):
+        victim = pos.mailbox[(move >> 6) & 63]
+        victim_value = PIECE_VALUES[victim % 6] if victim != EMPTY else PIECE_VALUES[PAWN]
+        attacker = pos.mailbox[move & 63] % 6
+        return victim_value * 10 - PIECE_VALUES[attacker] // 10 + (PIECE_VALUES[move >> 12] if move >> 12 else 0)
+
+    def order_moves(self, pos, moves, tt_move, ply):
+        killers = self.killers[ply]
+        history = self.history[pos.turn]
+
+        def key(move):
+            if move == tt_move:
+                return 10_000_000
+            if self.is_capture(pos, move) or move >> 12:
+                return 1_000_000 + self.mvv_lva(pos, move)
+            if move == killers[0]:
+                return 900_000
+            if move == killers[1]:
+                return 800_000
+            return history[move & 4095]
+
+        return sorted(moves, key=key, reverse=True)
+
+    def remember_cutoff(self, color, move, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1], killers[0] = killers[0], move
+        history = self.history[color]
+        history[move & 4095] += depth * depth
+        if history[move & 4095] > 700_000:
+            # Keep history scores below the killer bonus
+            for i in range(4096):
+                history[i] //= 2
+
+
+def tablebase_score(found, ply):
+    # A tablebase win in N plies is scored like a mate found N plies below this node
+    result, plies = found
+    if result == 0:
+        return 0
+    return (MATE - ply - plies) * result
+
+
+def score_to_table(score, ply):
+    # Mate scores are stored relative to the position, not the search root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+# -----------------------------------
+# Background Thinking
+# -----------------------------------
+
+class EngineThread:
+    """Runs Searcher.search() on its own thread; poll() returns the move once it is ready.
+
+    With an opening `book` (polyglot.OpeningBook), book positions are answered without searching.
+    """
+
+    def __init__(self, searcher=None, book=None, tablebase=None):
+        self.searcher = searcher or Searcher(tablebase=tablebase)
+        self.book = book
+        self.thread = None
+        self.result = None
+
+    def start(self, pos, remaining_time, max_depth=MAX_PLY):
+        self.result = None
+        if self.book is not None:
+            move = self.book.weighted_move(pos)
+            if move is not None:
+                # No thread needed: the next poll() hands the book move over
+                self.thread = None
+                self.result = (move, 0, 0)
+                return
+        # The search gets its own copy so the game can keep drawing the real position
+        budget = time_budget(remaining_time)
+        self.thread = threading.Thread(target=self._run, args=(pos.copy(), budget, max_depth), daemon=True)
+        self.thread.start()
+
+    def _run(self, pos, budget, max_depth):
+        self.result = self.searcher.search(pos, max_depth=max_depth, time_limit=budget)
+
+    def thinking(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def poll(self):
+        """Best move once the search has finished (or the book answered), else None."""
+        if self.result is None or self.thinking():
+            return None
+        move = self.result[0]
+        self.thread = None
+        self.result = None
+        return move
+
+    def cancel(self):
+        if self.thinking():
+            self.searcher.stop()
+            self.thread.join()
+        self.thread = None
+        self.result = None
@@ -0,0 +1,89 @@
+# eval_bench.py
+
+# Micro-benchmark for the evaluation: incremental (sums kept by
+# make()/unmake()) against recomputing the piece-square score from all 64
+# squares. It also checks that the two always agree.
+#
+# Positions come from random games played from the start position, so the
+# mix of openings, middlegames and endgames is roughly what a search sees.
+#
+# Usage:
+#   python eval_bench.py [--games 50] [--seconds 2]
+
+import argparse
+import random
+import sys
+import time
+
+from bitboard import Position
+from engine import evaluate, evaluate_full
+from movegen import legal_moves
+
+
+def sample_positions(games, seed=1, max_plies=120):
+    """(position, moves) pairs from random playouts: every move of each position gets evaluated."""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(games):
+        pos = Position.from_fen()
+        for _ in range(max_plies):
+            moves = legal_moves(pos)
+            if not moves:
+                break
+            samples.append((pos.copy(), moves))
+            pos.make(rng.choice(moves))
+    return samples
+
+
+def check(samples):
+    for pos, moves in samples:
+        for move in moves:
+            pos.make(move)
+            if evaluate(pos) != evaluate_full(pos):
+                raise AssertionError(f"incremental and full evaluation differ after move {move}")
+            pos.unmake()
+
+
+def bench(samples, evaluation, seconds):
+    """Evaluations per second of make + evaluation + unmake over every sampled move."""
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for pos, moves in samples:
+            for move in moves:
+                pos.make(move)
+                evaluation(pos)
+                pos.unmake()
+            done += len(moves)
+    return done / (time.perf_counter() - start)
+
+
+def bench_make_only(samples, seconds):
+    # make + unmake alone, so the cost of the evaluation itself can be separated out
+    return bench(samples, lambda pos: None, seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental vs full evaluation benchmark")
+    parser.add_argument("--games", type=int, default=50, help="random games to sample positions from")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time per measurement")
+    args = parser.parse_args(argv)
+
+    samples = sample_positions(args.games)
+    check(samples)
+    print(f"{len(samples)} positions, {sum(len(m) for _, m in samples)} moves; evaluations agree")
+
+    base = bench_make_only(samples, args.seconds)
+    results = [("make/unmake only", base),
+               ("incremental", bench(samples, evaluate, args.seconds)),
+               ("full recompute", bench(samples, evaluate_full, args.seconds))]
+    for name, rate in results:
+        # Time per evaluation with the make/unmake cost taken out
+        own = 1e9 / rate - 1e9 / base
+        extra = f"  ({own:6.0f} ns per evaluation)" if name != "make/unmake only" else ""
+        print(f"  {name:17} {rate:10.0f} /s{extra}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# game.py
+
+# The rules and state of one chess game, with no display code.
+# chess.py draws a Game and forwards clicks to it; tests, the engine, worker
+# processes and servers can create as many Games as they like, copy them,
+# and pickle them across a process pool.
+#
+# Draws by repetition are found with a table counting how often each
+# Zobrist key has occurred, so each move costs one dictionary update rather
+# than a comparison against every earlier board.
+
+from collections import Counter
+
+from bitboard import Position, START_FEN, WHITE, QUEEN, FIFTY_MOVE_PLIES, move_from, move_to, move_promo
+from movegen import legal_moves
+from notation import san, to_fen, write_pgn
+
+COLOR_NAMES = ["white", "black"]
+
+
+class Game:
+    """A position plus clocks, move history and the result."""
+
+    def __init__(self, fen=START_FEN, clock=300):
+        self.start_fen = fen
+        self.position = Position.from_fen(fen)
+        # Every legal move for the side to move, regenerated once per move
+        self.legal = legal_moves(self.position)
+        self.white_time = clock
+        self.black_time = clock
+        self.moves = []
+        # SAN of every move played (Nf3, exd5, O-O, e8=Q+), oldest first
+        self.history = []
+        # How many times each position (by Zobrist key) has appeared in this game
+        self.positions = Counter([self.position.key])
+        self.game_over = False
+        self.winner = ""
+        # "checkmate", "stalemate", "threefold repetition", "fifty-move rule" or "time"
+        self.end_reason = ""
+        self._check_game_end()
+
+    @property
+    def turn(self):
+        return COLOR_NAMES[self.position.turn]
+
+    def board(self):
+        """The position as the 8x8 grid of two-letter strings used for drawing."""
+        return self.position.to_board()
+
+    def copy(self):
+        other = Game.__new__(Game)
+        other.__dict__.update(self.__dict__)
+        other.position = self.position.copy()
+        other.legal = self.legal[:]
+        other.moves = self.moves[:]
+        other.history = self.history[:]
+        other.positions = self.positions.copy()
+        return other
+
+    def in_check(self, color_name=None):
+        color = self.position.turn if color_name is None else COLOR_NAMES.index(color_name)
+        return self.position.in_check(color)
+
+    # -------- Moves --------
+
+    def find_move(self, frm, to, promo=QUEEN):
+        """The legal move frm -> to (squares 0-63), or None. Promotions default to a queen."""
+        for move in self.legal:
+            if move_from(move) == frm and move_to(move) == to and move_promo(move) in (0, promo):
+                return move
+        return None
+
+    def targets(self, frm):
+        """Destination squares of the legal moves starting on `frm`."""
+        return {move_to(m) for m in self.legal if move_from(m) == frm}
+
+    def play(self, move):
+        if self.game_over or move not in self.legal:
+            raise ValueError(f"Illegal move {move}")
+        self.history.append(san(self.position, move, self.legal))
+
+        # make() handles castling, en passant and promotion in one place
+        self.position.make(move)
+        self.moves.append(move)
+        self.positions[self.position.key] += 1
+        self.legal = legal_moves(self.position)
+        self._check_game_end()
+
+    def _check_game_end(self):
+        if not self.legal:
+            self.game_over = True
+            if self.position.in_check():
+                self.winner = COLOR_NAMES[self.position.turn ^ 1]
+                self.end_reason = "checkmate"
+            else:
+                self.winner = "draw"
+                self.end_reason = "stalemate"
+        elif self.positions[self.position.key] >= 3:
+            self.game_over, self.winner, self.end_reason = True, "draw", "threefold repetition"
+        elif self.position.halfmove_clock >= FIFTY_MOVE_PLIES:
+            # Checked after checkmate: a mate on the hundredth ply still wins
+            self.game_over, self.winner, self.end_reason = True, "draw", "fifty-move rule"
+
+    # -------- Notation --------
+
+    def fen(self):
+        return to_fen(self.position)
+
+    def result(self):
+        if not self.game_over:
+            return "*"
+        return {"white": "1-0", "black": "0-1"}.get(self.winner, "1/2-1/2")
+
+    def pgn(self, headers=None):
+        return write_pgn(self.moves, headers, self.start_fen, self.result())
+
+    # -------- Clocks --------
+
+    def tick(self, seconds):
+        """Runs the clock of the side to move; flags the game if it reaches zero."""
+        if self.game_over:
+            return
+        if self.position.turn == WHITE:
+            self.white_time -= seconds
+            if self.white_time <= 0:
+                self.game_over, self.winner, self.end_reason = True, "black", "time"
+        else:
+            self.black_time -= seconds
+            if self.black_time <= 0:
+                self.game_over, self.winner, self.end_reason = True, "white", "time"
+
+    def time_left(self, color_name=None):
+        if color_name is None:
+            color_name = self.turn
+        return self.white_time if color_name == "white" else self.black_time
@@ -0,0 +1,56 @@
+# movegen.py
+
+# Lists the moves available in a bitboard Position.
+# Each piece only produces the squares it can actually reach, so finding all
+# legal moves costs a few dozen bit operations instead of testing every
+# (from, to) pair on the board.
+
+from bitboard import (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, WHITE, iter_bits,
+                      encode_move, move_from, move_to, move_promo)
+
+PROMOTIONS = [QUEEN, ROOK, BISHOP, KNIGHT]
+
+
+def generate_moves(pos):
+    """Pseudo-legal moves for the side to move (may leave the king in check)."""
+    moves = []
+    color = pos.turn
+    last_row = 0 if color == WHITE else 7
+    pawns = pos.bb[color * 6 + PAWN]
+    for frm in iter_bits(pos.occupied[color]):
+        targets = pos.targets(frm)
+        if pawns >> frm & 1:
+            for to in iter_bits(targets):
+                if to // 8 == last_row:
+                    moves.extend(encode_move(frm, to, promo) for promo in PROMOTIONS)
+                else:
+                    moves.append(encode_move(frm, to))
+        else:
+            moves.extend(encode_move(frm, to) for to in iter_bits(targets))
+    return moves
+
+
+def legal_moves(pos):
+    """Every legal move for the side to move."""
+    return [m for m in generate_moves(pos) if pos.is_safe_after(m & 63, (m >> 6) & 63)]
+
+
+def square_name(sq):
+    return "abcdefgh"[sq % 8] + str(8 - sq // 8)
+
+
+def move_name(move):
+    """Coordinate notation such as e2e4 or e7e8q."""
+    name = square_name(move_from(move)) + square_name(move_to(move))
+    if move_promo(move):
+        name += "pnbrqk"[move_promo(move)]
+    return name
+
+
+def parse_move(pos, name):
+    """The legal move written in coordinate notation (e2e4, e7e8q), or None."""
+    name = name.strip().lower()
+    for move in legal_moves(pos):
+        if move_name(move) == name:
+            return move
+    return None
@@ -0,0 +1,228 @@
+# notation.py
+
+# Reading and writing chess notation:
+#   FEN - one line describing a position
+#   SAN - standard algebraic notation for moves (Nf3, exd5, O-O, e8=Q+)
+#   PGN - a whole game: tag pairs plus the SAN moves
+
+import re
+
+from bitboard import (Position, START_FEN, WHITE, PAWN, KING, EMPTY, PIECE_LETTERS,
+                      move_from, move_to, move_promo)
+from movegen import legal_moves, square_name
+
+FILES = "abcdefgh"
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+# -----------------------------------
+# FEN
+# -----------------------------------
+
+def to_fen(pos):
+    rows = []
+    for r in range(8):
+        row, empty = "", 0
+        for c in range(8):
+            code = pos.mailbox[r * 8 + c]
+            if code == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                row, empty = row + str(empty), 0
+            letter = PIECE_LETTERS[code % 6]
+            row += letter.upper() if code < 6 else letter
+        rows.append(row + (str(empty) if empty else ""))
+
+    castling = "".join(ch for ch, flag in zip("KQkq", (1, 2, 4, 8)) if pos.castling & flag) or "-"
+    ep = square_name(pos.ep_square) if pos.ep_square is not None else "-"
+    turn = "w" if pos.turn == WHITE else "b"
+    return f"{'/'.join(rows)} {turn} {castling} {ep} {pos.halfmove_clock} {pos.fullmove_number}"
+
+
+# -----------------------------------
+# SAN
+# -----------------------------------
+
+def san(pos, move, legal=None):
+    """SAN for a legal `move` in `pos`, including the check (+) or mate (#) suffix."""
+    if legal is None:
+        legal = legal_moves(pos)
+    frm, to, promo = move_from(move), move_to(move), move_promo(move)
+    p_type = pos.mailbox[frm] % 6
+
+    if p_type == KING and abs(to - frm) == 2:
+        text = "O-O" if to > frm else "O-O-O"
+    else:
+        capture = pos.mailbox[to] != EMPTY or (p_type == PAWN and to == pos.ep_square)
+        if p_type == PAWN:
+            text = FILES[frm % 8] + "x" if capture else ""
+        else:
+            text = PIECE_LETTERS[p_type].upper()
+            # Other pieces of the same kind that could also go to `to`
+            rivals = [m for m in legal if move_to(m) == to and move_from(m) != frm
+                      and pos.mailbox[move_from(m)] == pos.mailbox[frm]]
+            if rivals:
+                if all(move_from(m) % 8 != frm % 8 for m in rivals):
+                    text += FILES[frm % 8]
+                elif all(move_from(m) // 8 != frm // 8 for m in rivals):
+                    text += str(8 - frm // 8)
+                else:
+                    text += square_name(frm)
+            if capture:
+                text += "x"
+        text += square_name(to)
+        if promo:
+            text += "=" + PIECE_LETTERS[promo].upper()
+
+    pos.make(move)
+    if pos.in_check():
+        text += "#" if not legal_moves(pos) else "+"
+    pos.unmake()
+    return text
+
+
+def parse_san(pos, text, legal=None):
+    """The legal move written as `text` in SAN, or None."""
+    if legal is None:
+        legal = legal_moves(pos)
+    text = text.rstrip("+#!?").replace("0", "O")
+    if text in ("O-O", "O-O-O"):
+        for move in legal:
+            frm, to = move_from(move), move_to(move)
+            if pos.mailbox[frm] % 6 == KING and abs(to - frm) == 2 and (to > frm) == (text == "O-O"):
+                return move
+        return None
+
+    match = re.fullmatch(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?", text)
+    if not match:
+        return None
+    piece, from_file, from_rank, target, promo = match.groups()
+    p_type = PIECE_LETTERS.index(piece.lower()) if piece else PAWN
+    to = (8 - int(target[1])) * 8 + FILES.index(target[0])
+    promo_type = PIECE_LETTERS.index(promo.lower()) if promo else 0
+
+    found = None
+    for move in legal:
+        frm = move_from(move)
+        if move_to(move) != to or pos.mailbox[frm] % 6 != p_type or move_promo(move) != promo_type:
+            continue
+        if from_file and FILES[frm % 8] != from_file:
+            continue
+        if from_rank and str(8 - frm // 8) != from_rank:
+            continue
+        if found is not None:
+            return None  # ambiguous
+        found = move
+    return found
+
+
+# -----------------------------------
+# PGN
+# -----------------------------------
+
+def moves_to_san(pos, moves):
+    """SAN for a sequence of moves played from `pos` (which is left unchanged)."""
+    pos = pos.copy()
+    names = []
+    for move in moves:
+        names.append(san(pos, move))
+        pos.make(move)
+    return names
+
+
+def write_pgn(moves, headers=None, start_fen=START_FEN, result="*"):
+    """A complete PGN game for `moves` (bitboard move ints) played from `start_fen`."""
+    tags = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?",
+            "White": "?", "Black": "?", "Result": result}
+    tags.update(headers or {})
+    if start_fen != START_FEN:
+        tags["SetUp"] = "1"
+        tags["FEN"] = start_fen
+    lines = [f'[{name} "{value}"]' for name, value in tags.items()]
+    lines.append("")
+
+    pos = Position.from_fen(start_fen)
+    tokens = []
+    number, turn = pos.fullmove_number, pos.turn
+    for i, name in enumerate(moves_to_san(pos, moves)):
+        if turn == WHITE:
+            tokens.append(f"{number}.")
+        elif i == 0:
+            tokens.append(f"{number}...")
+        tokens.append(name)
+        if turn != WHITE:
+            number += 1
+        turn ^= 1
+    tokens.append(tags["Result"])
+
+    # PGN lines should stay under 80 characters
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+_TAG = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+_COMMENTS = re.compile(r"\{[^}]*\}|;[^\n]*")
+_NUMBERS = re.compile(r"\d+\.(\.\.)?")
+
+
+def read_games(lines):
+    """Yields (headers, movetext) for each game in an iterable of PGN lines, one game at a time."""
+    headers, movetext, in_moves = {}, [], False
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("%"):
+            continue
+        if line.startswith("["):
+            if in_moves:
+                yield headers, " ".join(movetext)
+                headers, movetext, in_moves = {}, [], False
+            match = _TAG.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+            continue
+        in_moves = True
+        movetext.append(line)
+    if headers or movetext:
+        yield headers, " ".join(movetext)
+
+
+def movetext_tokens(movetext):
+    """SAN tokens of the main line, with comments, variations, NAGs and move numbers removed."""
+    text = _COMMENTS.sub(" ", movetext)
+    # Drop (variations), which may be nested
+    depth, kept = 0, []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            kept.append(ch)
+    tokens = []
+    for token in _NUMBERS.sub(" ", "".join(kept)).split():
+        if token.startswith("$") or token in RESULTS:
+            continue
+        tokens.append(token)
+    return tokens
+
+
+def replay(headers, movetext):
+    """Plays a PGN game through the move logic. Returns (moves, error or None)."""
+    pos = Position.from_fen(headers.get("FEN", START_FEN))
+    moves = []
+    for token in movetext_tokens(movetext):
+        move = parse_san(pos, token)
+        if move is None:
+            ply = len(moves)
+            return moves, f"illegal move {token!r} at {ply // 2 + 1}{'.' if ply % 2 == 0 else '...'}"
+        pos.make(move)
+        moves.append(move)
+    return moves, None
@@ -0,0 +1,176 @@
+# parallel.py
+
+# Multi-core search in the "Lazy SMP" style.
+# Every worker process runs the normal iterative-deepening search on the same
+# position. They do not split the work explicitly; instead they all read and
+# write one transposition table placed in shared memory, so each worker
+# keeps finding positions another worker has already searched. Helper
+# workers get slightly different move ordering so they explore different
+# parts of the tree first.
+#
+# Usage:
+#   with ParallelSearcher(workers=4, hash_mb=64, tablebase_path="endgames.bin") as searcher:
+#       move, score, depth = searcher.search(pos, time_limit=5)
+#       print(searcher.worker_stats)
+#
+# The shared memory block holds the table followed by one 64-bit node counter
+# per worker. Each worker writes its own count there every 1024 nodes (from
+# check_limits), so the parent can report the real total while the search runs.
+
+import multiprocessing as mp
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+from engine import Searcher, MAX_PLY
+from tablebase import EndgameTables
+from transposition import TranspositionTable, table_bytes
+
+COUNTER_BYTES = 8  # one signed 64-bit node counter per worker
+
+
+class WorkerSearcher(Searcher):
+    """A Searcher that also stops when the shared stop event is set, and publishes its node count."""
+
+    def __init__(self, table, stop_event, seed, tablebase=None, counters=None):
+        super().__init__(table, tablebase)
+        self.stop_event = stop_event
+        self.seed = seed
+        self.counters = counters  # the shared node counters; slot `seed` is ours
+
+    def reset_heuristics(self):
+        super().reset_heuristics()
+        if getattr(self, "seed", 0):
+            # Small random history scores make helper workers order quiet moves differently
+            rng = random.Random(self.seed)
+            for table in self.history:
+                for i in range(len(table)):
+                    table[i] = rng.randrange(16)
+
+    def check_limits(self):
+        if self.counters is not None:
+            self.counters[self.seed] = self.nodes
+        if self.stop_event.is_set():
+            self.stop_flag = True
+        super().check_limits()
+
+
+def node_counters(shm, nbytes, workers):
+    """The per-worker node counters stored after the table in the shared memory block."""
+    return shm.buf[nbytes:nbytes + COUNTER_BYTES * workers].cast("q")
+
+
+def _worker_main(worker_id, workers, shm_name, nbytes, tablebase_path, jobs, results, stop_event):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    table = TranspositionTable(buffer=shm.buf[:nbytes])
+    counters = node_counters(shm, nbytes, workers)
+    # Every worker maps the tablebase file itself; the pages are shared through the OS cache
+    tablebase = EndgameTables(tablebase_path) if tablebase_path else None
+    searcher = WorkerSearcher(table, stop_event, seed=worker_id, tablebase=tablebase, counters=counters)
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            pos, max_depth, time_limit, node_limit = job
+
+            def report(depth, score, move, nodes, seconds):
+                results.put(("info", worker_id, depth, score, move, nodes, seconds))
+
+            start = time.perf_counter()
+            move, score, depth = searcher.search(pos, max_depth=max_depth, time_limit=time_limit,
+                                                 node_limit=node_limit,
+                                                 on_iteration=report if worker_id == 0 else None)
+            results.put(("done", worker_id, move, score, depth, searcher.nodes, time.perf_counter() - start))
+    finally:
+        if tablebase is not None:
+            tablebase.close()
+        table.release()
+        counters.release()
+        shm.close()
+
+
+class ParallelSearcher:
+    """Lazy-SMP search across `workers` processes sharing one transposition table."""
+
+    def __init__(self, workers=None, hash_mb=16, tablebase_path=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        nbytes = table_bytes(hash_mb)
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes + COUNTER_BYTES * self.workers)
+        # The parent keeps a view of the table too, for hashfull and clearing
+        self.table = TranspositionTable(buffer=self.shm.buf[:nbytes])
+        self.counters = node_counters(self.shm, nbytes, self.workers)
+        self.stop_event = mp.Event()
+        self.results = mp.Queue()
+        self.jobs = []
+        self.processes = []
+        for worker_id in range(self.workers):
+            jobs = mp.Queue()
+            process = mp.Process(target=_worker_main, daemon=True,
+                                 args=(worker_id, self.workers, self.shm.name, nbytes, tablebase_path, jobs, self.results,
+                                       self.stop_event))
+            process.start()
+            self.jobs.append(jobs)
+            self.processes.append(process)
+        self.nodes = 0
+        # One dict per worker from the last search: depth, nodes, seconds, nps
+        self.worker_stats = []
+
+    def stop(self):
+        self.stop_event.set()
+
+    def search(self, pos, max_depth=MAX_PLY, time_limit=None, node_limit=None, on_iteration=None):
+        """Same interface and result as Searcher.search(); `node_limit` is shared between the workers."""
+        self.stop_event.clear()
+        self.table.new_search()
+        for i in range(self.workers):
+            self.counters[i] = 0
+        per_worker_nodes = node_limit // self.workers + 1 if node_limit else None
+        for jobs in self.jobs:
+            jobs.put((pos, max_depth, time_limit, per_worker_nodes))
+
+        done = {}
+        while len(done) < self.workers:
+            message = self.results.get()
+            if message[0] == "info":
+                _, _, depth, score, move, nodes, seconds = message
+                if on_iteration:
+                    # Worker 0 reports its own depth; the helpers' counts are at most 1023 nodes behind
+                    nodes += sum(self.counters[i] for i in range(1, self.workers))
+                    on_iteration(depth, score, move, nodes, seconds)
+                continue
+            _, worker_id, move, score, depth, nodes, seconds = message
+            done[worker_id] = (move, score, depth, nodes, seconds)
+            if worker_id == 0:
+                # The main worker has an answer; the helpers are no longer needed
+                self.stop_event.set()
+
+        self.worker_stats = [
+            {"worker": i, "depth": done[i][2], "nodes": done[i][3], "seconds": done[i][4],
+             "nps": int(done[i][3] / done[i][4]) if done[i][4] > 0 else 0}
+            for i in range(self.workers)
+        ]
+        self.nodes = sum(stats["nodes"] for stats in self.worker_stats)
+
+        # Trust the deepest finished search; worker 0 wins ties
+        best = max(range(self.workers), key=lambda i: (done[i][2], i == 0))
+        move, score, depth = done[best][:3]
+        return move, score, depth
+
+    def close(self):
+        self.stop_event.set()
+        for jobs in self.jobs:
+            jobs.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+        self.table.release()
+        self.counters.release()
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
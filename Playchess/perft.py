@@ -0,0 +1,114 @@
+# perft.py
+
+# Headless move-generation checker and benchmark.
+# perft(depth) counts every legal move sequence of the given length. The
+# counts for the positions below are well known, so any bug in castling,
+# en passant, promotion or check detection shows up as a wrong number.
+#
+# Usage:
+#   python perft.py                      # every position at its default depth
+#   python perft.py kiwipete --depth 4   # one position, deeper
+#   python perft.py --fen "<FEN>" --depth 3 --divide
+#
+# Exits with status 1 if any count is wrong, so it can be used as a regression gate.
+
+import argparse
+import sys
+import time
+
+from bitboard import Position, START_FEN
+from movegen import legal_moves, move_name
+
+# name: (FEN, default depth, expected node counts for depth 1, 2, 3, ...)
+POSITIONS = {
+    "start": (START_FEN, 4, [20, 400, 8902, 197281, 4865609]),
+    # Castling, pins, en passant and promotions all in one position
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3,
+                 [48, 2039, 97862, 4085603]),
+    # En passant captures that would expose the king along a rank
+    "en-passant": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 4,
+                   [14, 191, 2812, 43238, 674624]),
+    # Under-promotions, promotion captures and castling rights lost to captures
+    "promotion": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3,
+                  [6, 264, 9467, 422333]),
+    "promotion-race": ("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1", 4,
+                       [24, 496, 9483, 182838, 3605103]),
+    "checks": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3,
+               [44, 1486, 62379, 2103487]),
+}
+
+
+def perft(pos, depth):
+    moves = legal_moves(pos)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        pos.make(move)
+        nodes += perft(pos, depth - 1)
+        pos.unmake()
+    return nodes
+
+
+def divide(pos, depth):
+    # Node count below each root move, for tracking down a wrong total
+    counts = {}
+    for move in legal_moves(pos):
+        pos.make(move)
+        counts[move_name(move)] = perft(pos, depth - 1) if depth > 1 else 1
+        pos.unmake()
+    return counts
+
+
+def run(name, fen, depth, expected):
+    """Prints one line per depth and returns False if a known count does not match."""
+    pos = Position.from_fen(fen)
+    ok = True
+    print(f"{name}: {fen}")
+    for d in range(1, depth + 1):
+        start = time.perf_counter()
+        nodes = perft(pos, d)
+        elapsed = time.perf_counter() - start
+        nps = nodes / elapsed if elapsed > 0 else 0
+        status = ""
+        if d <= len(expected):
+            status = "ok" if nodes == expected[d - 1] else f"FAIL (expected {expected[d - 1]})"
+            ok = ok and nodes == expected[d - 1]
+        print(f"  depth {d}: {nodes:>10} nodes  {elapsed:8.3f}s  {nps:>10.0f} nps  {status}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft correctness and speed check")
+    parser.add_argument("positions", nargs="*", help=f"named positions ({', '.join(POSITIONS)})")
+    parser.add_argument("--depth", type=int, help="search depth (default: per position)")
+    parser.add_argument("--fen", help="run a custom position instead of the named ones")
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        pos = Position.from_fen(args.fen)
+        depth = args.depth or 3
+        if args.divide:
+            for move, nodes in sorted(divide(pos, depth).items()):
+                print(f"{move}: {nodes}")
+        return 0 if run("custom", args.fen, depth, []) else 1
+
+    names = args.positions or list(POSITIONS)
+    ok = True
+    for name in names:
+        if name not in POSITIONS:
+            parser.error(f"unknown position {name!r}")
+        fen, default_depth, expected = POSITIONS[name]
+        if args.divide:
+            pos = Position.from_fen(fen)
+            for move, nodes in sorted(divide(pos, args.depth or default_depth).items()):
+                print(f"{move}: {nodes}")
+        ok = run(name, fen, args.depth or default_depth, expected) and ok
+
+    print("all counts match" if ok else "PERFT MISMATCH")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
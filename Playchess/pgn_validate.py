@@ -0,0 +1,110 @@
+# pgn_validate.py
+
+# Replays every game in one or more PGN files through the move logic and
+# reports the ones containing an illegal or unreadable move.
+#
+# The file is read one game at a time and games are handed to worker
+# processes in small batches. Only a fixed number of batches is ever in
+# flight, so memory use stays flat even for archives with millions of games.
+#
+# Usage:
+#   python pgn_validate.py games.pgn [more.pgn ...] [--workers 8] [--batch 200]
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from notation import read_games, replay
+
+MAX_ERRORS_SHOWN = 20
+
+
+def validate_batch(batch):
+    """Worker side: returns (games, moves, [(game number, error), ...]) for one batch."""
+    moves = 0
+    errors = []
+    for number, headers, movetext in batch:
+        try:
+            played, error = replay(headers, movetext)
+        except ValueError as exc:
+            # A broken FEN tag ends up here
+            played, error = [], str(exc)
+        moves += len(played)
+        if error:
+            errors.append((number, error))
+    return len(batch), moves, errors
+
+
+def batches(paths, size):
+    number = 0
+    batch = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for headers, movetext in read_games(f):
+                number += 1
+                batch.append((number, headers, movetext))
+                if len(batch) == size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def validate(paths, workers=None, batch_size=200, report_every=5.0, out=sys.stdout):
+    """Validates every game in `paths`; returns (games, moves, invalid, first errors)."""
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    games = moves = invalid = 0
+    # Only the first few errors are kept: an archive full of broken games must not fill the memory.
+    # Batches are collected in order, so these are the lowest game numbers
+    errors = []
+    start = last_report = time.perf_counter()
+
+    def collect(result):
+        nonlocal games, moves, invalid, last_report
+        done_games, done_moves, batch_errors = result.get()
+        games += done_games
+        moves += done_moves
+        invalid += len(batch_errors)
+        errors.extend(batch_errors[:MAX_ERRORS_SHOWN - len(errors)])
+        now = time.perf_counter()
+        if report_every and now - last_report >= report_every:
+            last_report = now
+            out.write(f"  {games} games, {games / (now - start):.0f} games/s\n")
+            out.flush()
+
+    with Pool(workers) as pool:
+        pending = deque()
+        for batch in batches(paths, batch_size):
+            pending.append(pool.apply_async(validate_batch, (batch,)))
+            # Back-pressure: wait for the oldest batch before reading further
+            if len(pending) >= max_in_flight:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    elapsed = time.perf_counter() - start
+    out.write(f"{games} games, {moves} moves, {invalid} invalid in {elapsed:.2f}s "
+              f"({games / elapsed if elapsed else 0:.0f} games/s, {moves / elapsed if elapsed else 0:.0f} moves/s)\n")
+    for number, error in errors:
+        out.write(f"  game {number}: {error}\n")
+    if invalid > len(errors):
+        out.write(f"  ... and {invalid - len(errors)} more\n")
+    return games, moves, invalid, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay and validate PGN archives")
+    parser.add_argument("paths", nargs="+", help="PGN files")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--batch", type=int, default=200, help="games per batch sent to a worker")
+    args = parser.parse_args(argv)
+    _, _, invalid, _ = validate(args.paths, args.workers, args.batch)
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# polyglot.py
+
+# Polyglot opening books.
+# A book is a file of 16-byte entries sorted by position key:
+#   key (8 bytes) | move (2 bytes) | weight (2 bytes) | learn (4 bytes), big-endian
+# The file is memory-mapped and searched with binary search, so opening a
+# book costs nothing and a lookup touches only a handful of pages, however
+# large the book is.
+#
+# Keys are the Zobrist keys from zobrist.py, which uses Polyglot's own
+# Random64 table, so books from other Polyglot tools work as well as the
+# ones written by build_book().
+#
+# Usage:
+#   python polyglot.py build games.pgn book.bin [--plies 16]
+#   python polyglot.py probe book.bin ["<FEN>"]
+
+import argparse
+import mmap
+import random
+import struct
+import sys
+from collections import Counter
+
+from bitboard import Position, START_FEN, KING, EMPTY, encode_move, move_from, move_to, move_promo
+from movegen import legal_moves, move_name
+from notation import read_games, replay
+
+ENTRY = struct.Struct(">QHHI")
+
+
+# -----------------------------------
+# Move Encoding
+# -----------------------------------
+
+def _polyglot_square(sq):
+    # Polyglot counts rows from rank 1; bitboard.py counts them from rank 8
+    return (7 - sq // 8) * 8 + sq % 8
+
+
+def decode_move(pos, raw):
+    """The legal move for Polyglot move bits `raw` in `pos`, or None."""
+    to = (7 - (raw >> 3 & 7)) * 8 + (raw & 7)
+    frm = (7 - (raw >> 9 & 7)) * 8 + (raw >> 6 & 7)
+    promo = raw >> 12 & 7
+    # Polyglot writes castling as "king takes own rook" (e1h1); we use e1g1
+    if pos.mailbox[frm] % 6 == KING and pos.mailbox[to] != EMPTY and pos.mailbox[to] // 6 == pos.turn:
+        to = frm + 2 if to > frm else frm - 2
+    move = encode_move(frm, to, promo)
+    return move if move in legal_moves(pos) else None
+
+
+def encode_polyglot_move(pos, move):
+    frm, to, promo = move_from(move), move_to(move), move_promo(move)
+    if pos.mailbox[frm] % 6 == KING and abs(to - frm) == 2:
+        to = frm + 3 if to > frm else frm - 4
+    return _polyglot_square(to) | (_polyglot_square(frm) << 6) | (promo << 12)
+
+
+# -----------------------------------
+# Reading
+# -----------------------------------
+
+class OpeningBook:
+    """A memory-mapped Polyglot book."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            self.map = b""
+        self.count = len(self.map) // ENTRY.size
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key_at(self, i):
+        return ENTRY.unpack_from(self.map, i * ENTRY.size)[0]
+
+    def _first_index(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, pos):
+        """[(move, weight), ...] for `pos`; moves that are not legal here are skipped."""
+        found = []
+        i = self._first_index(pos.key)
+        while i < self.count:
+            key, raw, weight, _ = ENTRY.unpack_from(self.map, i * ENTRY.size)
+            if key != pos.key:
+                break
+            move = decode_move(pos, raw)
+            if move is not None:
+                found.append((move, weight))
+            i += 1
+        return found
+
+    def best_move(self, pos):
+        found = self.entries(pos)
+        return max(found, key=lambda e: e[1])[0] if found else None
+
+    def weighted_move(self, pos, rng=random):
+        """A book move picked at random in proportion to its weight (for varied self-play)."""
+        found = [(m, w) for m, w in self.entries(pos) if w > 0]
+        if not found:
+            return None
+        return rng.choices([m for m, _ in found], weights=[w for _, w in found])[0]
+
+
+# -----------------------------------
+# Writing
+# -----------------------------------
+
+def write_book(path, counts):
+    """Writes {(key, polyglot move): weight} as a sorted Polyglot book."""
+    # Weights are 16-bit; scale them down if the most common move would overflow
+    top = max(counts.values(), default=1)
+    scale = max(1, -(-top // 0xFFFF))
+    with open(path, "wb") as f:
+        for (key, raw), weight in sorted(counts.items()):
+            f.write(ENTRY.pack(key, raw, max(1, weight // scale), 0))
+
+
+def build_book(pgn_paths, out_path, plies=16):
+    """Builds a book from the first `plies` moves of every game in `pgn_paths`."""
+    counts = Counter()
+    games = 0
+    for path in pgn_paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for headers, movetext in read_games(f):
+                moves, _ = replay(headers, movetext)
+                pos = Position.from_fen(headers.get("FEN", START_FEN))
+                for move in moves[:plies]:
+                    counts[(pos.key, encode_polyglot_move(pos, move))] += 1
+                    pos.make(move)
+                games += 1
+    write_book(out_path, counts)
+    return games, len(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Polyglot opening book tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build a book from PGN files")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("book")
+    build.add_argument("--plies", type=int, default=16)
+    probe = sub.add_parser("probe", help="list the book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("fen", nargs="?", default=START_FEN)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        games, entries = build_book(args.pgn, args.book, args.plies)
+        print(f"{games} games -> {entries} book entries in {args.book}")
+        return 0
+
+    pos = Position.from_fen(args.fen)
+    with OpeningBook(args.book) as book:
+        found = book.entries(pos)
+        for move, weight in sorted(found, key=lambda e: -e[1]):
+            print(f"{move_name(move)} {weight}")
+    return 0 if found else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# tablebase.py
+
+# Exact results for the basic mates: KQK, KRK and KPK.
+#
+# The generator works backwards from checkmate (retrograde analysis):
+#   1. every position where black is mated is "lost in 0"
+#   2. any white-to-move position with a move into a lost-in-n position is
+#      "won in n + 1"
+#   3. a black-to-move position is "lost in n + 2" once every black move
+#      leads to a position white wins
+# and repeats until nothing new is found. Everything left over is a draw.
+#
+# Each table stores one byte per position, indexed by
+#   (side to move, white king, black king, white piece)
+# with 0 = draw, 1..254 = white mates in (value - 1) plies, 255 = illegal.
+# All tables go into one packed file that is memory-mapped when probing, so
+# a probe is a single byte read. Positions where black has the extra piece
+# are probed by flipping the board.
+#
+# Usage:
+#   python tablebase.py generate [endgames.bin]
+#   python tablebase.py probe endgames.bin "<FEN>"
+
+import argparse
+import mmap
+import struct
+import sys
+import time
+
+from bitboard import (Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                      KING_ATTACKS, PAWN_ATTACKS, rook_attacks, queen_attacks, iter_bits)
+from movegen import legal_moves, move_name
+
+DRAW, ILLEGAL = 0, 255
+TABLE_SIZE = 2 * 64 * 64 * 64
+MAGIC = b"PCTB"
+HEADER = struct.Struct("<4sHH")
+DIRECTORY = struct.Struct("<4sII")
+# KPK is built last because pawn promotions look up the KQK and KRK results
+TABLES = [("KQK", QUEEN), ("KRK", ROOK), ("KPK", PAWN)]
+
+
+def index(stm, wk, bk, piece):
+    return ((stm * 64 + wk) * 64 + bk) * 64 + piece
+
+
+# -----------------------------------
+# Generator
+# -----------------------------------
+
+def _piece_attacks(p_type, sq, occupied):
+    if p_type == QUEEN:
+        return queen_attacks(sq, occupied)
+    if p_type == ROOK:
+        return rook_attacks(sq, occupied)
+    return PAWN_ATTACKS[WHITE][sq]
+
+
+def _pawn_origins(sq, occupied):
+    # Squares a white pawn could have pushed from to reach `sq`
+    found = []
+    below = sq + 8
+    if below < 56 and not occupied >> below & 1:
+        found.append(below)
+        if sq // 8 == 4 and not occupied >> (below + 8) & 1:
+            found.append(below + 8)
+    return found
+
+
+def generate_table(p_type, solved=None):
+    """Builds one table. `solved` maps piece type -> finished table, used for pawn promotions."""
+    values = bytearray([ILLEGAL]) * TABLE_SIZE
+    # Black-to-move positions: how many black moves are not yet known to lose
+    remaining = {}
+    buckets = [[] for _ in range(256)]
+    promo_targets = [(QUEEN, solved.get(QUEEN)), (ROOK, solved.get(ROOK))] if solved else []
+
+    for wk in range(64):
+        for bk in range(64):
+            if bk == wk or KING_ATTACKS[wk] >> bk & 1:
+                continue
+            for piece in range(64):
+                if piece == wk or piece == bk:
+                    continue
+                if p_type == PAWN and piece // 8 in (0, 7):
+                    continue
+                occupied = (1 << wk) | (1 << bk) | (1 << piece)
+                attacked = KING_ATTACKS[wk] | _piece_attacks(p_type, piece, occupied & ~(1 << bk))
+                in_check = attacked >> bk & 1
+
+                # White to move is only legal if black is not in check
+                if not in_check:
+                    i = index(WHITE, wk, bk, piece)
+                    values[i] = DRAW
+                    if p_type == PAWN and piece // 8 == 1 and not occupied >> (piece - 8) & 1:
+                        # Promotion: the result comes straight from the KQK / KRK table
+                        best = None
+                        for _, table in promo_targets:
+                            v = table[index(BLACK, wk, bk, piece - 8)]
+                            if 0 < v < ILLEGAL and (best is None or v < best):
+                                best = v
+                        if best is not None:
+                            buckets[best].append(i)
+
+                i = index(BLACK, wk, bk, piece)
+                values[i] = DRAW
+                escapes = KING_ATTACKS[bk] & ~attacked & ~(1 << wk)
+                if escapes >> piece & 1:
+                    # Black can take the undefended piece: a draw whatever else happens
+                    continue
+                escapes &= ~(1 << piece)
+                moves = escapes.bit_count()
+                if moves == 0:
+                    if in_check:
+                        values[i] = 1
+                        buckets[0].append(i)
+                    continue
+                remaining[i] = moves
+
+    # Walk outwards from the mates one ply at a time
+    for plies in range(254):
+        for i in buckets[plies]:
+            stm, rest = divmod(i, 64 * 64 * 64)
+            wk, rest = divmod(rest, 64 * 64)
+            bk, piece = divmod(rest, 64)
+            if stm == WHITE:
+                # White positions can be queued more than once; the first (fastest) win counts
+                if values[i] != DRAW:
+                    continue
+                values[i] = plies + 1
+                # Black king moves that led here: those positions lose one of their escapes
+                occupied = (1 << wk) | (1 << piece)
+                for origin in iter_bits(KING_ATTACKS[bk] & ~occupied):
+                    j = index(BLACK, wk, origin, piece)
+                    if j in remaining:
+                        remaining[j] -= 1
+                        if remaining[j] == 0:
+                            del remaining[j]
+                            values[j] = plies + 2
+                            buckets[plies + 1].append(j)
+            else:
+                # White moves that led here: those positions are won one ply later
+                occupied = (1 << wk) | (1 << bk) | (1 << piece)
+                for origin in iter_bits(KING_ATTACKS[wk] & ~occupied & ~KING_ATTACKS[bk]):
+                    j = index(WHITE, origin, bk, piece)
+                    if values[j] == DRAW:
+                        buckets[plies + 1].append(j)
+                if p_type == PAWN:
+                    origins = _pawn_origins(piece, occupied)
+                else:
+                    origins = iter_bits(_piece_attacks(p_type, piece, occupied) & ~occupied)
+                for origin in origins:
+                    j = index(WHITE, wk, bk, origin)
+                    if values[j] == DRAW:
+                        buckets[plies + 1].append(j)
+    return values
+
+
+def generate(path="endgames.bin", out=sys.stdout):
+    solved = {}
+    blobs = []
+    for name, p_type in TABLES:
+        start = time.perf_counter()
+        values = generate_table(p_type, solved)
+        solved[p_type] = values
+        blobs.append((name, values))
+        wins = sum(1 for v in values if 0 < v < ILLEGAL)
+        out.write(f"{name}: {wins} wins, longest {max(v for v in values if v < ILLEGAL) - 1} plies, "
+                  f"{time.perf_counter() - start:.1f}s\n")
+
+    offset = HEADER.size + DIRECTORY.size * len(blobs)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1, len(blobs)))
+        for name, values in blobs:
+            f.write(DIRECTORY.pack(name.encode(), offset, len(values)))
+            offset += len(values)
+        for _, values in blobs:
+            f.write(values)
+
+
+# -----------------------------------
+# Probing
+# -----------------------------------
+
+class EndgameTables:
+    """Memory-mapped tables written by generate()."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an endgame table file")
+        self.offsets = {}
+        for n in range(count):
+            name, offset, _ = DIRECTORY.unpack_from(self.map, HEADER.size + n * DIRECTORY.size)
+            self.offsets[name.rstrip(b"\0").decode()] = offset
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def probe(self, pos):
+        """(result, plies) for the side to move: result is 1 win, 0 draw, -1 loss. None if not covered."""
+        pieces = pos.occupied[WHITE] | pos.occupied[BLACK]
+        count = pieces.bit_count()
+        if count > 3:
+            return None
+        if count == 2:
+            return 0, 0
+        sq = next(s for s in iter_bits(pieces) if pos.mailbox[s] % 6 != KING)
+        code = pos.mailbox[sq]
+        strong, p_type = divmod(code, 6)
+        if p_type in (KNIGHT, BISHOP):
+            return 0, 0  # a lone minor piece cannot mate
+        offset = self.offsets.get({QUEEN: "KQK", ROOK: "KRK", PAWN: "KPK"}[p_type])
+        if offset is None:
+            return None
+
+        wk, bk, stm = pos.kings[strong], pos.kings[strong ^ 1], pos.turn
+        if strong == BLACK:
+            # Flip the board so the side with the piece plays "white"
+            wk, bk, sq, stm = wk ^ 56, bk ^ 56, sq ^ 56, stm ^ 1
+        value = self.map[offset + index(stm, wk, bk, sq)]
+        if value == DRAW or value == ILLEGAL:
+            return 0, 0
+        # The strong side wins; it is a win for the side to move when that is the strong side
+        return (1 if stm == WHITE else -1), value - 1
+
+    def best_move(self, pos):
+        """The move that wins fastest, loses slowest or keeps the draw. None if not covered."""
+        if self.probe(pos) is None:
+            return None
+        best, best_key = None, None
+        for move in legal_moves(pos):
+            pos.make(move)
+            found = self.probe(pos)
+            pos.unmake()
+            if found is None:
+                continue
+            result, plies = found
+            # Child results are for the opponent: their loss is our win
+            if result == -1:
+                key = (2, -plies)
+            elif result == 0:
+                key = (1, 0)
+            else:
+                key = (0, plies)
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KQK / KRK / KPK endgame tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="build the table file")
+    gen.add_argument("path", nargs="?", default="endgames.bin")
+    probe = sub.add_parser("probe", help="look up a position")
+    probe.add_argument("path")
+    probe.add_argument("fen")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generate(args.path)
+        return 0
+
+    tables = EndgameTables(args.path)
+    pos = Position.from_fen(args.fen)
+    found = tables.probe(pos)
+    if found is None:
+        print("not in the tables")
+        return 1
+    result, plies = found
+    print({1: f"win, mate in {plies} plies", 0: "draw", -1: f"loss, mated in {plies} plies"}[result])
+    move = tables.best_move(pos)
+    if move is not None:
+        print(f"best move {move_name(move)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
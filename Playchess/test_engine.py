@@ -0,0 +1,44 @@
+# test_engine.py
+
+# Run with: python -m pytest -q   (from the Playchess folder)
+
+import time
+from collections import Counter
+
+from bitboard import Position
+from engine import EngineThread
+from movegen import parse_move
+from polyglot import OpeningBook, encode_polyglot_move, write_book
+
+
+def wait_for_move(engine, seconds=10):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        move = engine.poll()
+        if move is not None:
+            return move
+        time.sleep(0.01)
+    return None
+
+
+def test_book_move_through_engine_thread(tmp_path):
+    pos = Position.from_fen()
+    book_move = parse_move(pos, "e2e4")
+    path = tmp_path / "book.bin"
+    write_book(path, Counter({(pos.key, encode_polyglot_move(pos, book_move)): 1}))
+
+    with OpeningBook(path) as book:
+        engine = EngineThread(book=book)
+        engine.start(pos, 60)
+        assert not engine.thinking()
+        assert engine.poll() == book_move
+        # Handed over once only
+        assert engine.poll() is None
+
+
+def test_search_move_through_engine_thread():
+    engine = EngineThread()
+    pos = Position.from_fen("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+    engine.start(pos, 60, max_depth=2)
+    assert wait_for_move(engine) == parse_move(pos, "a1a8")
+
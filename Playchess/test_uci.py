@@ -0,0 +1,56 @@
+# test_uci.py
+
+# Run with: python -m pytest -q   (from the Playchess folder)
+
+import io
+import time
+
+from engine import MATE
+from uci import UciEngine, format_score
+
+
+def bestmoves(out):
+    return [line for line in out.getvalue().splitlines() if line.startswith("bestmove")]
+
+
+def test_format_score_mates():
+    assert format_score(MATE - 1) == "mate 1"
+    assert format_score(MATE - 2) == "mate 1"
+    assert format_score(MATE - 3) == "mate 2"
+    assert format_score(-MATE + 1) == "mate -1"
+    assert format_score(-MATE + 2) == "mate -1"
+    assert format_score(-MATE + 4) == "mate -2"
+    assert format_score(35) == "cp 35"
+
+
+def test_go_skips_non_numeric_arguments():
+    out = io.StringIO()
+    uci = UciEngine(out)
+    uci.handle("position startpos")
+    uci.handle("go searchmoves e2e4 d2d4 depth 1")
+    uci.wait()
+    uci.handle("go depth 1 ponder")
+    uci.handle("stop")
+    assert len(bestmoves(out)) == 2
+
+
+def test_go_infinite_waits_for_stop():
+    out = io.StringIO()
+    uci = UciEngine(out)
+    # Mate in one: the search ends at once, but bestmove must wait for "stop"
+    uci.handle("position fen 6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+    uci.handle("go infinite")
+    time.sleep(0.5)
+    assert bestmoves(out) == []
+    uci.handle("stop")
+    assert bestmoves(out) == ["bestmove a1a8"]
+
+
+def test_bad_fen_keeps_the_engine_running():
+    out = io.StringIO()
+    uci = UciEngine(out)
+    uci.handle("position fen 6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+    before = uci.position.key
+    assert uci.handle("position fen 8/8/8/8/8/8/8/8 w - e")
+    assert "info string bad fen" in out.getvalue()
+    assert uci.position.key == before
@@ -0,0 +1,26 @@
+# test_zobrist.py
+
+# Run with: python -m pytest -q   (from the Playchess folder)
+
+import pytest
+
+from bitboard import Position
+from movegen import parse_move
+
+# Reference keys from the Polyglot book format specification
+POLYGLOT_KEYS = [
+    ("", 0x463B96181691FC9C),
+    ("e2e4", 0x823C9B50FD114196),
+    ("e2e4 d7d5 e4e5 f7f5", 0x22A48B5A8E47FF78),
+    ("e2e4 d7d5 e4e5 f7f5 e1e2 e8f7", 0x00FDD303C946BDD9),
+    ("a2a4 b7b5 h2h4 b5b4 c2c4 b4c3 a1a3", 0x5C3F9B829B279560),
+]
+
+
+@pytest.mark.parametrize("moves, key", POLYGLOT_KEYS)
+def test_keys_match_polyglot(moves, key):
+    pos = Position.from_fen()
+    for name in moves.split():
+        pos.make(parse_move(pos, name))
+    assert pos.key == key
+    assert pos.compute_key() == key
@@ -0,0 +1,235 @@
+# tournament.py
+
+# Headless engine-vs-engine matches for checking that a change did not cost
+# playing strength.
+#
+# Two engine configurations play each other from a fixed list of openings.
+# Every opening is played twice with the colours swapped, so neither side
+# gets the better openings. Games run in a process pool. Each finished game
+# is appended to a PGN file and a results file straight away, so an
+# interrupted match still leaves everything played so far.
+#
+# Time control: the same 300 second clocks as the board game, multiplied
+# by --scale (0.1 gives 30 second games). Each move gets time_budget() of
+# the side's clock, and the clock is charged with the time actually used
+# (an engine with a node limit ignores the clock, see below).
+#
+# An engine is written as name[:option=value,...], with these options:
+#   hash=16   transposition table size in MB
+#   depth=64  maximum search depth
+#   nodes=0   node limit per move (0 = none) instead of the clock; makes games reproducible
+#   tb=path   endgame tables from tablebase.py
+#
+# Usage:
+#   python tournament.py --games 100 --workers 4 new:hash=32 old:hash=16
+#   -> "new" vs "old": +12.4 +/- 30.1 Elo ...
+
+import argparse
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from engine import Searcher, MAX_PLY, time_budget
+from game import Game
+from notation import parse_san
+from tablebase import EndgameTables
+from transposition import TranspositionTable
+
+CLOCK = 300
+# Short, balanced openings (SAN from the start position)
+OPENINGS = [
+    "e4 e5 Nf3 Nc6 Bb5",
+    "e4 c5 Nf3 d6 d4 cxd4 Nxd4",
+    "e4 e6 d4 d5",
+    "e4 c6 d4 d5",
+    "d4 d5 c4 e6 Nc3 Nf6",
+    "d4 Nf6 c4 g6 Nc3 Bg7",
+    "d4 Nf6 c4 e6 Nf3 b6",
+    "c4 e5 Nc3 Nf6",
+    "Nf3 d5 g3 Nf6 Bg2",
+    "e4 e5 Nf3 Nf6",
+]
+
+
+def parse_engine(text):
+    """"name:hash=32,depth=8" -> {"name": ..., "hash": 32, "depth": 8, "nodes": 0, "tb": None}."""
+    name, _, options = text.partition(":")
+    config = {"name": name, "hash": 16, "depth": MAX_PLY, "nodes": 0, "tb": None}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        if key not in config or key == "name":
+            raise ValueError(f"unknown engine option {key!r} in {text!r}")
+        config[key] = value if key == "tb" else int(value)
+    return config
+
+
+# -----------------------------------
+# Worker Side
+# -----------------------------------
+
+# Searchers are created once per worker process and reused for every game it plays
+_searchers = {}
+
+
+def _searcher(config):
+    key = tuple(sorted(config.items()))
+    if key not in _searchers:
+        tablebase = EndgameTables(config["tb"]) if config["tb"] else None
+        _searchers[key] = Searcher(TranspositionTable(config["hash"]), tablebase)
+    return _searchers[key]
+
+
+def play_game(job):
+    """Plays one game; returns a dict with the PGN, result and per-side search statistics."""
+    number, opening, white, black, clock = job
+    game = Game(clock=clock)
+    for token in opening.split():
+        game.play(parse_san(game.position, token, game.legal))
+
+    configs = [white, black]
+    searchers = [_searcher(white), _searcher(black)]
+    for searcher in searchers:
+        searcher.table.clear()
+    nodes = [0, 0]
+    seconds = [0.0, 0.0]
+
+    while not game.game_over:
+        side = game.position.turn
+        config = configs[side]
+        # With a node limit the clock is left out completely: a time limit or a flag
+        # would make the result depend on how busy the machine is
+        node_limit = config["nodes"] or None
+        start = time.perf_counter()
+        move, _, _ = searchers[side].search(game.position.copy(), max_depth=config["depth"],
+                                            time_limit=None if node_limit else time_budget(game.time_left()),
+                                            node_limit=node_limit)
+        used = time.perf_counter() - start
+        nodes[side] += searchers[side].nodes
+        seconds[side] += used
+        if not node_limit:
+            game.tick(used)
+        if not game.game_over:
+            game.play(move)
+
+    headers = {"Event": "Playchess tournament", "Round": str(number),
+               "White": white["name"], "Black": black["name"],
+               "Opening": opening, "Termination": game.end_reason}
+    return {"number": number, "white": white["name"], "black": black["name"], "result": game.result(),
+            "reason": game.end_reason, "plies": len(game.moves), "pgn": game.pgn(headers),
+            "nodes": nodes, "seconds": seconds}
+
+
+# -----------------------------------
+# Statistics
+# -----------------------------------
+
+def elo_difference(scores):
+    """(Elo, 95% error margin) from per-game scores (1, 0.5, 0) of one side."""
+    n = len(scores)
+    if n == 0:
+        return 0.0, 0.0
+    mean = sum(scores) / n
+    variance = sum((s - mean) ** 2 for s in scores) / n
+    margin = 1.96 * math.sqrt(variance / n)
+
+    def elo(score):
+        score = min(max(score, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / score - 1)
+
+    diff = elo(mean)
+    return diff, (elo(mean + margin) - elo(mean - margin)) / 2
+
+
+class MatchStats:
+    """Running totals for engine `a` against engine `b`."""
+
+    def __init__(self, a, b):
+        self.a, self.b = a, b
+        self.scores = []
+        self.wins = self.draws = self.losses = 0
+        self.nodes = {a: 0, b: 0}
+        self.seconds = {a: 0.0, b: 0.0}
+
+    def add(self, record):
+        points = {"1-0": 1.0, "0-1": 0.0}.get(record["result"], 0.5)
+        if record["white"] != self.a:
+            points = 1 - points
+        self.scores.append(points)
+        if points == 1:
+            self.wins += 1
+        elif points == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        for side, name in enumerate((record["white"], record["black"])):
+            self.nodes[name] += record["nodes"][side]
+            self.seconds[name] += record["seconds"][side]
+
+    def nps(self, name):
+        return int(self.nodes[name] / self.seconds[name]) if self.seconds[name] else 0
+
+    def summary(self, elapsed):
+        diff, margin = elo_difference(self.scores)
+        games = len(self.scores)
+        return (f"{self.a} vs {self.b}: {games} games, +{self.wins} ={self.draws} -{self.losses}, "
+                f"{diff:+.1f} +/- {margin:.1f} Elo, "
+                f"{games * 3600 / elapsed if elapsed else 0:.0f} games/hour, "
+                f"nps {self.a} {self.nps(self.a)} / {self.b} {self.nps(self.b)}")
+
+
+# -----------------------------------
+# Driver
+# -----------------------------------
+
+def schedule(a, b, games, clock):
+    """Game jobs: each opening twice with colours swapped, cycling through OPENINGS."""
+    jobs = []
+    for number in range(games):
+        opening = OPENINGS[(number // 2) % len(OPENINGS)]
+        white, black = (a, b) if number % 2 == 0 else (b, a)
+        jobs.append((number + 1, opening, white, black, clock))
+    return jobs
+
+
+def run(a, b, games=20, workers=None, scale=1.0, pgn_path="tournament.pgn",
+        results_path="tournament.txt", report_every=10, out=sys.stdout):
+    """Plays the match and returns its MatchStats."""
+    if a["name"] == b["name"]:
+        raise ValueError("the two engines need different names")
+    workers = workers or os.cpu_count() or 1
+    stats = MatchStats(a["name"], b["name"])
+    start = time.perf_counter()
+    with open(pgn_path, "w") as pgn, open(results_path, "w") as results, Pool(workers) as pool:
+        results.write("game\twhite\tblack\tresult\treason\tplies\n")
+        for record in pool.imap_unordered(play_game, schedule(a, b, games, CLOCK * scale)):
+            stats.add(record)
+            pgn.write(record["pgn"] + "\n")
+            results.write(f"{record['number']}\t{record['white']}\t{record['black']}\t{record['result']}\t"
+                          f"{record['reason']}\t{record['plies']}\n")
+            pgn.flush()
+            results.flush()
+            if report_every and len(stats.scores) % report_every == 0:
+                out.write("  " + stats.summary(time.perf_counter() - start) + "\n")
+                out.flush()
+    out.write(stats.summary(time.perf_counter() - start) + "\n")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine-vs-engine matches")
+    parser.add_argument("engines", nargs=2, help="name[:hash=16,depth=64,nodes=0,tb=path]")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--workers", type=int, help="parallel games (default: all cores)")
+    parser.add_argument("--scale", type=float, default=0.1, help="fraction of the 300 s clock per side")
+    parser.add_argument("--pgn", default="tournament.pgn")
+    parser.add_argument("--results", default="tournament.txt")
+    args = parser.parse_args(argv)
+    a, b = (parse_engine(text) for text in args.engines)
+    run(a, b, args.games, args.workers, args.scale, args.pgn, args.results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
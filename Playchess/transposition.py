@@ -0,0 +1,159 @@
+# transposition.py
+
+# A fixed-size cache of facts about positions, indexed by Zobrist key.
+# The same position is often reached through different move orders; the
+# table lets the engine reuse what it already worked out.
+#
+# Every entry is two unsigned 64-bit words in one flat buffer:
+#   word 0: key XOR data   (lets a probe notice a half-written or foreign entry)
+#   word 1: data, packed as
+#       bits  0-15  best move (bitboard.py encoding)
+#       bits 16-31  search score (signed)
+#       bits 32-47  unused (see below)
+#       bits 48-55  search depth
+#       bits 56-57  bound type
+#       bits 58-59  legality (has moves / checkmate / stalemate)
+#       bits 60-63  search generation, used to age out old entries
+#
+# There is no static-evaluation field: the evaluation is kept up to date by
+# make()/unmake() (pst.py) and costs a few arithmetic operations, less than
+# reading it back from the table would.
+#
+# Entries are grouped in buckets of two. Slot 0 keeps the deepest result
+# (depth-preferred), slot 1 is always overwritten, so a flood of shallow
+# results cannot push out expensive deep ones.
+
+from collections import namedtuple
+
+BOUND_NONE, BOUND_LOWER, BOUND_UPPER, BOUND_EXACT = 0, 1, 2, 3
+LEGAL_UNKNOWN, LEGAL_HAS_MOVES, LEGAL_CHECKMATE, LEGAL_STALEMATE = 0, 1, 2, 3
+
+ENTRY_BYTES = 16
+BUCKET_SIZE = 2
+
+TTEntry = namedtuple("TTEntry", "move score depth bound legal")
+
+
+def _pack(move, score, depth, bound, legal, generation):
+    return (move & 0xFFFF) \
+        | ((score & 0xFFFF) << 16) \
+        | ((max(0, min(depth, 255))) << 48) \
+        | (bound << 56) | (legal << 58) | ((generation & 15) << 60)
+
+
+def _signed16(value):
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _unpack(data):
+    return TTEntry(data & 0xFFFF, _signed16((data >> 16) & 0xFFFF), (data >> 48) & 0xFF, (data >> 56) & 3, (data >> 58) & 3)
+
+
+def table_bytes(size_mb):
+    """Buffer size for a table of about `size_mb` megabytes (rounded down to a power-of-two bucket count)."""
+    entries = max(BUCKET_SIZE, size_mb * 1024 * 1024 // ENTRY_BYTES)
+    buckets = 1 << (entries // BUCKET_SIZE).bit_length() - 1
+    return buckets * BUCKET_SIZE * ENTRY_BYTES
+
+
+class TranspositionTable:
+    """Bounded position cache. Pass `buffer` to place the table in memory you own (e.g. shared memory)."""
+
+    def __init__(self, size_mb=16, buffer=None):
+        if buffer is None:
+            buffer = bytearray(table_bytes(size_mb))
+        buckets = len(buffer) // (BUCKET_SIZE * ENTRY_BYTES)
+        if buckets == 0 or buckets & (buckets - 1):
+            raise ValueError("Buffer must hold a power-of-two number of buckets")
+        self.buffer = buffer
+        byte_view = memoryview(buffer).cast("B")
+        self.words = byte_view.cast("Q")
+        self._views = [self.words, byte_view]
+        self.mask = buckets - 1
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def release(self):
+        # Drops our views of the buffer so shared memory can be closed
+        for view in self._views:
+            view.release()
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+
+    def clear(self):
+        words = self.words
+        for i in range(len(words)):
+            words[i] = 0
+        self.generation = 0
+
+    def new_search(self):
+        # Entries from older searches become the first to be replaced
+        self.generation = (self.generation + 1) & 15
+
+    def _slot(self, key):
+        # Word index of the first entry in the key's bucket
+        return (key & self.mask) * BUCKET_SIZE * 2
+
+    def _find(self, key):
+        # Word index of the entry holding `key`, or None
+        words = self.words
+        i = self._slot(key)
+        for j in range(i, i + BUCKET_SIZE * 2, 2):
+            data = words[j + 1]
+            if data and words[j] ^ data == key:
+                return j
+        return None
+
+    def probe(self, key):
+        """Returns the TTEntry stored for `key`, or None."""
+        self.probes += 1
+        j = self._find(key)
+        if j is None:
+            return None
+        self.hits += 1
+        return _unpack(self.words[j + 1])
+
+    def store(self, key, move, score, depth, bound, legal=LEGAL_UNKNOWN):
+        words = self.words
+        j = self._find(key)
+        if j is not None:
+            # Same position already stored: update it in place
+            data = words[j + 1]
+            old = _unpack(data)
+            if depth < old.depth and old.bound != BOUND_NONE and (data >> 60) == self.generation:
+                # Do not overwrite a deeper result from this search with a shallower one
+                move, score, depth, bound = old.move, old.score, old.depth, old.bound
+            self._write(j, key, move or old.move, score, depth, bound, legal or old.legal)
+            return
+
+        # Depth-preferred slot: take it if empty, stale, or our result is at least as deep
+        i = self._slot(key)
+        old_data = words[i + 1]
+        if not old_data or (old_data >> 60) != self.generation or depth >= (old_data >> 48) & 0xFF:
+            self._write(i, key, move, score, depth, bound, legal)
+        else:
+            self._write(i + 2, key, move, score, depth, bound, legal)
+
+    def store_legality(self, key, legal):
+        # Records only whether the side to move has moves, keeping any search result
+        j = self._find(key)
+        if j is None:
+            self.store(key, 0, 0, 0, BOUND_NONE, legal)
+        else:
+            old = _unpack(self.words[j + 1])
+            self._write(j, key, old.move, old.score, old.depth, old.bound, legal)
+
+    def _write(self, j, key, move, score, depth, bound, legal):
+        data = _pack(move, score, depth, bound, legal, self.generation)
+        self.words[j + 1] = data
+        self.words[j] = key ^ data
+
+    def hashfull(self):
+        """Per-mille of the first 1000 entries written by the current search (the UCI convention)."""
+        words = self.words
+        count = min(1000, len(words) // 2)
+        used = sum(1 for j in range(0, count * 2, 2)
+                   if words[j + 1] and (words[j + 1] >> 60) == self.generation)
+        return used * 1000 // count
+
@@ -0,0 +1,239 @@
+# uci.py
+
+# UCI (Universal Chess Interface) front-end for the engine.
+# Chess GUIs and tournament managers start this script and talk to it over
+# stdin/stdout, e.g.:
+#   position startpos moves e2e4 e7e5
+#   go wtime 300000 btime 300000
+#   -> info depth 5 score cp 20 nodes 20480 nps 51200 time 400 pv g1f3
+#   -> bestmove g1f3
+#
+# Usage: python uci.py
+
+import os
+import sys
+import threading
+
+from bitboard import Position, START_FEN, WHITE
+from engine import Searcher, MATE, MATE_BOUND, MAX_PLY, time_budget
+from movegen import move_name, parse_move
+from parallel import ParallelSearcher
+from polyglot import OpeningBook
+from tablebase import EndgameTables
+from transposition import TranspositionTable
+
+ENGINE_NAME = "Playchess"
+DEFAULT_HASH_MB = 16
+
+# "go" arguments that take a number; anything else (searchmoves and its moves, ponder) is skipped
+GO_NUMBERS = {"wtime", "btime", "winc", "binc", "movestogo", "depth", "nodes", "mate", "movetime"}
+
+
+def format_score(score):
+    # UCI counts mates in full moves: mate in 1 or 2 plies is "mate 1", being mated in 1 or 2 plies is "mate -1"
+    if score >= MATE_BOUND:
+        return f"mate {(MATE - score + 1) // 2}"
+    if score <= -MATE_BOUND:
+        return f"mate {-((MATE + score + 1) // 2)}"
+    return f"cp {score}"
+
+
+class UciEngine:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.lock = threading.Lock()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.book = None
+        self.tablebase = None
+        self.endgame_path = None
+        self.searcher = Searcher(TranspositionTable(DEFAULT_HASH_MB))
+        self.position = Position.from_fen()
+        self.thread = None
+        # An infinite (or ponder) search keeps its bestmove until "stop" sets this
+        self.infinite = False
+        self.stopped = threading.Event()
+
+    def send(self, line):
+        with self.lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    # -------- Commands --------
+
+    def handle(self, line):
+        """Runs one command line; returns False when the engine should exit."""
+        parts = line.split()
+        if not parts:
+            return True
+        command, args = parts[0], parts[1:]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author lh2nw")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 1024")
+            self.send(f"option name Threads type spin default 1 min 1 max {os.cpu_count() or 1}")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name EndgameFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.wait()
+            self.searcher.table.clear()
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "position":
+            self.wait()
+            self.set_position(args)
+        elif command == "go":
+            self.wait()
+            self.go(args)
+        elif command in ("stop", "ponderhit"):
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, args):
+        text = " ".join(args)
+        if " value " not in text:
+            return
+        name, value = text.split(" value ", 1)
+        name = name.replace("name", "", 1).strip().lower()
+        if name == "bookfile":
+            if self.book is not None:
+                self.book.close()
+            value = value.strip()
+            self.book = OpeningBook(value) if value and value != "<empty>" else None
+            return
+        if name == "endgamefile":
+            value = value.strip()
+            self.endgame_path = value if value and value != "<empty>" else None
+        elif name == "hash":
+            self.hash_mb = max(1, int(value))
+        elif name == "threads":
+            self.threads = max(1, int(value))
+        else:
+            return
+        self.stop()
+        self.close_searcher()
+        if self.threads > 1:
+            # The worker processes open the tablebase themselves
+            self.searcher = ParallelSearcher(self.threads, self.hash_mb, self.endgame_path)
+        else:
+            self.tablebase = EndgameTables(self.endgame_path) if self.endgame_path else None
+            self.searcher = Searcher(TranspositionTable(self.hash_mb), self.tablebase)
+
+    def close_searcher(self):
+        if isinstance(self.searcher, ParallelSearcher):
+            self.searcher.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+
+    def set_position(self, args):
+        if not args:
+            return
+        if args[0] == "startpos":
+            fen, rest = START_FEN, args[1:]
+        elif args[0] == "fen":
+            end = args.index("moves") if "moves" in args else len(args)
+            fen, rest = " ".join(args[1:end]), args[end:]
+        else:
+            return
+        try:
+            pos = Position.from_fen(fen)
+        except ValueError as exc:
+            # A bad FEN must not end the loop (the GUI would lose the engine); keep the old position
+            self.send(f"info string bad fen: {exc}")
+            return
+        if rest and rest[0] == "moves":
+            for name in rest[1:]:
+                move = parse_move(pos, name)
+                if move is None:
+                    self.send(f"info string illegal move {name}")
+                    break
+                pos.make(move)
+        self.position = pos
+
+    def go(self, args):
+        limits = {}
+        i = 0
+        while i < len(args):
+            if args[i] in ("infinite", "ponder"):
+                limits["infinite"] = True
+            elif args[i] in GO_NUMBERS and i + 1 < len(args) and args[i + 1].lstrip("-").isdigit():
+                limits[args[i]] = int(args[i + 1])
+                i += 1
+            i += 1
+
+        depth = limits.get("depth", MAX_PLY)
+        nodes = limits.get("nodes")
+        time_limit = None
+        if "movetime" in limits:
+            time_limit = limits["movetime"] / 1000
+        elif not limits.get("infinite"):
+            side = "w" if self.position.turn == WHITE else "b"
+            if f"{side}time" in limits:
+                time_limit = time_budget(limits[f"{side}time"] / 1000, limits.get(f"{side}inc", 0) / 1000,
+                                         limits.get("movestogo"))
+
+        pos = self.position.copy()
+        self.infinite = bool(limits.get("infinite"))
+        self.stopped.clear()
+        if self.book is not None and not self.infinite:
+            move = self.book.weighted_move(pos)
+            if move is not None:
+                self.send("info string book move")
+                self.send(f"bestmove {move_name(move)}")
+                return
+        self.thread = threading.Thread(target=self.think, args=(pos, depth, time_limit, nodes), daemon=True)
+        self.thread.start()
+
+    def think(self, pos, depth, time_limit, nodes):
+        def report(d, score, move, searched, seconds):
+            nps = int(searched / seconds) if seconds > 0 else 0
+            self.send(f"info depth {d} score {format_score(score)} nodes {searched} nps {nps} "
+                      f"time {int(seconds * 1000)} hashfull {self.searcher.table.hashfull()} pv {move_name(move)}")
+
+        move, _, _ = self.searcher.search(pos, max_depth=depth, time_limit=time_limit,
+                                          node_limit=nodes, on_iteration=report)
+        for stats in getattr(self.searcher, "worker_stats", []):
+            self.send(f"info string worker {stats['worker']} depth {stats['depth']} "
+                      f"nodes {stats['nodes']} nps {stats['nps']}")
+        if self.infinite:
+            # The search may finish early (mate found, maximum depth); the GUI still decides when to move
+            self.stopped.wait()
+        self.send(f"bestmove {move_name(move) if move else '0000'}")
+
+    def stop(self):
+        # Cuts the running search short; it still prints its bestmove
+        self.stopped.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.searcher.stop()
+        self.wait()
+
+    def wait(self):
+        # Lets a running search finish before a command that changes the engine state.
+        # An infinite search never finishes by itself, so that one is stopped instead.
+        if self.thread is not None:
+            if self.infinite:
+                self.stopped.set()
+                self.searcher.stop()
+            self.thread.join()
+        self.thread = None
+
+
+def main():
+    uci = UciEngine()
+    for line in sys.stdin:
+        if not uci.handle(line.strip()):
+            break
+    uci.stop()
+    uci.close_searcher()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# async_server.py
+
+# The same chat server as server.py, but run by one asyncio event loop instead of one thread per client.
+#
+# Why: every thread needs its own stack (megabytes of reserved memory), so
+# server.py tops out at a few thousand users. Here each client is just a
+# small Connection object waiting on its socket; the event loop (built on the
+# `selectors` module: epoll on Linux, kqueue on macOS) wakes up only the
+# clients that actually sent something. Tens of thousands of idle
+# connections fit in one process.
+#
+# Messages use the framed protocol of protocol.py (type + length + payload), the same as client.py:
+#   server -> USERNAME frame, client -> USERNAME frame with its name
+#   TEXT "/msg username text"  sends a private message
+#   TEXT "/join room"          moves you to another room ("lobby" is where everyone starts)
+#   TEXT "/leave"              goes back to the lobby
+#   TEXT "/rooms"              lists the rooms and how many people are in each
+#   TEXT "/history username"   shows your last private messages with that person
+#   any other TEXT             goes to everyone else in your room
+#
+# `rooms` maps each room to its members, so a message only touches the
+# people in that room: sending costs the room's size, not the number of
+# people on the whole server.
+#
+# Chat messages containing a word from blocklist.txt are not passed on
+# (wordfilter.py; edits to the file are picked up while the server runs).
+#
+# Chat and private messages are also kept in an on-disk MessageLog
+# (msglog.py). Whoever enters a room first gets its last HISTORY messages,
+# read from the log and sent as one batch.
+#
+# Each connection is an asyncio.BufferedProtocol: the event loop calls
+# recv_into() straight into that connection's FrameBuffer, so reading
+# creates no new bytes objects.
+#
+# Sending never waits either. Each transport keeps a small kernel-side
+# buffer; once a client stops reading and that fills past WRITE_HIGH_WATER,
+# asyncio calls pause_writing() and further frames go into the client's
+# bounded Outbox instead. resume_writing() flushes the outbox in one write.
+# If the outbox fills up too, the slow-consumer policy from outbox.py
+# decides (drop-oldest, disconnect or coalesce), so one stalled client can
+# never make the server hold an unbounded backlog.
+#
+# Usage: python async_server.py [--policy drop-oldest|disconnect|coalesce] [--log-dir DIR] [--history N] [--blocklist FILE]
+
+import argparse
+import asyncio
+import os
+
+from msglog import MessageLog, room_thread, dm_thread
+from outbox import Outbox, SlowConsumer, DROP_OLDEST, POLICIES
+from protocol import USERNAME, TEXT, SYSTEM, FrameBuffer, ProtocolError, frame, text
+from wordfilter import BLOCKLIST, WordFilter
+
+HOST = "127.0.0.1"
+PORT = 5555
+
+# How long a new connection gets to answer "USERNAME" before we give up on it
+HANDSHAKE_TIMEOUT = 10
+# Pending connections the OS keeps for us while we are busy (listen() backlog)
+BACKLOG = 4096
+# Bytes asyncio may hold for one client before the outbox takes over
+WRITE_HIGH_WATER = 64 * 1024
+
+LOBBY = "lobby"
+MAX_ROOM_NAME = 32
+
+# Messages replayed to someone entering a room
+HISTORY = 20
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_history")
+
+
+def raise_file_limit():
+    # Every connection is an open file; the default limit (often 1024) would stop us long before memory does
+    try:
+        import resource
+    except ImportError:  # Windows has no such limit
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class Connection(asyncio.BufferedProtocol):
+    """One client socket. The event loop calls these methods; the chat logic lives in ChatServer."""
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = FrameBuffer()
+        self.outbox = Outbox(server.policy)
+        self.paused = False
+        self.transport = None
+        self.username = None
+        self.room = None
+        self.timeout = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        self.send(frame(USERNAME, ""))
+        # The handshake is just a state of this connection, so a slow client only delays itself
+        self.timeout = asyncio.get_running_loop().call_later(HANDSHAKE_TIMEOUT, self.close)
+
+    def get_buffer(self, sizehint):
+        return self.buffer.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self.buffer.buffer_updated(nbytes)
+        try:
+            for msg_type, payload in self.buffer.frames():
+                if self.transport.is_closing():
+                    break
+                self.server.handle_frame(self, msg_type, payload)
+        except ProtocolError:
+            self.close()
+
+    def connection_lost(self, exc):
+        self.timeout.cancel()
+        self.server.remove(self)
+
+    def send(self, data):
+        # write() never waits: the data is queued and the event loop sends it when the socket is ready
+        if self.transport.is_closing():
+            return
+        if not self.paused:
+            self.transport.write(data)
+            return
+        try:
+            self.outbox.push(data)
+        except SlowConsumer:
+            # "disconnect" policy: drop the connection without waiting to flush what it could not read
+            self.transport.abort()
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        if self.outbox:
+            self.transport.write(self.outbox.pop_all())
+
+    def close(self):
+        self.transport.close()
+
+
+class ChatServer:
+    def __init__(self, host=HOST, port=PORT, policy=DROP_OLDEST, log=None, history=HISTORY, blocklist=BLOCKLIST):
+        self.host = host
+        self.port = port
+        self.policy = policy
+        self.word_filter = WordFilter(blocklist)
+        # msglog.MessageLog (or None for no history) and how many messages to replay
+        self.log = log
+        self.history = history
+        # username -> Connection. Replaces the two parallel lists of server.py.
+        self.clients = {}
+        # room name -> {username: Connection}: who gets the messages sent to each room
+        self.rooms = {}
+
+    # -------- Sending --------
+
+    def broadcast(self, message, sender=None, msg_type=TEXT, room=LOBBY):
+        # The frame is built once and the same bytes go to everybody in the room (and to the log)
+        data = frame(msg_type, message)
+        if msg_type == TEXT:
+            self.record(room_thread(room), data)
+        self.deliver(data, sender, room)
+
+    def deliver(self, data, sender=None, room=LOBBY):
+        members = self.rooms.get(room)
+        if not members:
+            return
+        for username, connection in list(members.items()):
+            if username != sender:  # Don't send the message back to the person who wrote it
+                connection.send(data)
+
+    def system(self, connection, message):
+        connection.send(frame(SYSTEM, message))
+
+    def private_message(self, sender, target, content):
+        if not self.deliver_private(sender, target, content):
+            self.system(self.clients[sender], "System: User not found.")
+
+    def deliver_private(self, sender, target, content):
+        # Returns False if `target` is not connected here; the caller decides how to tell the sender
+        connection = self.clients.get(target)
+        if connection is None:
+            return False
+        data = frame(TEXT, f"[PM from {sender}]: {content}")
+        connection.send(data)
+        self.record(dm_thread(sender, target), data)
+        return True
+
+    # -------- History --------
+
+    def record(self, thread, data):
+        # Queued for the log's writer thread; never waits for the disk
+        if self.log is not None:
+            self.log.append(thread, data)
+
+    def replay(self, connection, thread):
+        if self.log is None or not self.history:
+            return
+        # Each chunk is many frames back to back, so this is one send per log segment
+        for chunk in self.log.tail(thread, self.history):
+            connection.send(chunk)
+
+    # -------- Receiving --------
+
+    def handle_frame(self, connection, msg_type, payload):
+        if connection.username is None:
+            if msg_type == USERNAME:
+                self.register(connection, text(payload).strip())
+        elif msg_type == TEXT:
+            self.handle_message(connection.username, text(payload))
+
+    def register(self, connection, username):
+        connection.timeout.cancel()
+        if not username:
+            self.reject(connection, "System: Empty username.")
+        elif username in self.clients:
+            self.reject(connection, "System: Username already taken.")
+        else:
+            self.accept(connection, username)
+
+    def reject(self, connection, reason):
+        self.system(connection, reason)
+        connection.close()
+
+    def accept(self, connection, username):
+        connection.username = username
+        self.clients[username] = connection
+        print(f"Username is {username}")
+        self.enter_room(connection, LOBBY)
+        self.replay(connection, room_thread(LOBBY))
+        self.broadcast(f"{username} joined the chat!", msg_type=SYSTEM)
+
+    # -------- Rooms --------
+
+    def enter_room(self, connection, room):
+        members = self.rooms.get(room)
+        if members is None:
+            members = self.rooms[room] = {}
+            self.room_opened(room)
+        members[connection.username] = connection
+        connection.room = room
+
+    def exit_room(self, connection):
+        room = connection.room
+        members = self.rooms.get(room)
+        connection.room = None
+        if members is None:
+            return
+        members.pop(connection.username, None)
+        if not members:
+            del self.rooms[room]
+            self.room_closed(room)
+
+    def room_opened(self, room):
+        # Called when a room gets its first member here (the sharded server tells its hub)
+        pass
+
+    def room_closed(self, room):
+        # Called when the last member here leaves a room
+        pass
+
+    def join(self, username, room):
+        connection = self.clients[username]
+        if not room or len(room) > MAX_ROOM_NAME or " " in room:
+            self.system(connection, f"System: Room names are one word of up to {MAX_ROOM_NAME} characters.")
+            return
+        if room == connection.room:
+            self.system(connection, f"System: You are already in {room}.")
+            return
+        old = connection.room
+        self.exit_room(connection)
+        self.broadcast(f"{username} went to {room}.", msg_type=SYSTEM, room=old)
+        self.enter_room(connection, room)
+        self.replay(connection, room_thread(room))
+        self.broadcast(f"{username} joined {room}.", msg_type=SYSTEM, room=room)
+
+    def room_list(self):
+        return ", ".join(f"{room} ({len(members)})" for room, members in sorted(self.rooms.items()))
+
+    def handle_message(self, username, message):
+        # client.py sends "name: text"; look for commands in the text part
+        body = message[len(username) + 2:] if message.startswith(username + ": ") else message
+
+        # FEATURE: Private Messaging Logic
+        # Syntax: /msg username message
+        if body.startswith("/msg"):
+            parts = body.split(" ", 2)
+            if len(parts) < 3:
+                self.system(self.clients[username], "System: Usage: /msg username message")
+            else:
+                self.private_message(username, parts[1], parts[2])
+
+        # FEATURE: Rooms
+        # Syntax: /join room, /leave, /rooms
+        elif body.startswith("/join"):
+            self.join(username, body[len("/join"):].strip())
+        elif body.strip() == "/leave":
+            self.join(username, LOBBY)
+        elif body.strip() == "/rooms":
+            self.system(self.clients[username], f"System: Rooms: {self.room_list()}")
+        elif body.startswith("/history"):
+            other = body[len("/history"):].strip()
+            if other:
+                self.replay(self.clients[username], dm_thread(username, other))
+            else:
+                self.system(self.clients[username], "System: Usage: /history username")
+
+        # FEATURE: Word Filtering (The "Family Friendly" Filter)
+        elif self.word_filter.find(body):
+            self.system(self.clients[username], "System: Please keep the chat clean!")
+
+        else:
+            self.broadcast(message, sender=username, room=self.clients[username].room)
+
+    def remove(self, connection):
+        username = connection.username
+        if username is not None and self.clients.get(username) is connection:
+            del self.clients[username]
+            room = connection.room
+            self.exit_room(connection)
+            self.broadcast(f"{username} left the chat!", msg_type=SYSTEM, room=room)
+
+    # -------- Main Loop --------
+
+    async def listen(self, reuse_port=False):
+        raise_file_limit()
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: Connection(self), self.host, self.port,
+                                        backlog=BACKLOG, reuse_port=reuse_port)
+
+    async def serve(self):
+        server = await self.listen()
+        print(f"Server running on {self.host}:{self.port} (asyncio)...")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="asyncio chat server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--policy", choices=POLICIES, default=DROP_OLDEST, help="what to do with clients that cannot keep up")
+    parser.add_argument("--log-dir", default=HISTORY_DIR, help="where chat history is kept")
+    parser.add_argument("--history", type=int, default=HISTORY, help="messages replayed on join (0 = no history)")
+    parser.add_argument("--blocklist", default=BLOCKLIST, help="file of blocked words, reloaded when it changes")
+    args = parser.parse_args()
+    log = MessageLog(args.log_dir) if args.history else None
+    try:
+        asyncio.run(ChatServer(args.host, args.port, args.policy, log, args.history, args.blocklist).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if log is not None:
+            log.close()
@@ -6,6 +6,9 @@ import socket
 import threading
 from datetime import datetime # For timestamps
 
+# protocol: every message travels as a frame (type + length), so messages never get split or glued together
+from protocol import USERNAME, TEXT, FrameBuffer, recv_frames, send_frame, text
+
 #	HOST = server IP address.
 # 127.0.0.1 means connect to server running on same machine.
 # PORT = communication channel number.
@@ -25,16 +28,18 @@ client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 client.connect((HOST, PORT))
 
 #	Defines function responsible for listening to server messages.
+#	One FrameBuffer is reused for every read (recv_into fills it in place).
 def receive_messages():
+    buffer = FrameBuffer()
     while True:
         try:
-            message = client.recv(1024).decode("utf-8")
-            if message == "USERNAME":
-                client.send(username.encode("utf-8"))
-            else:
-                # Add a timestamp to incoming messages
-                time_now = datetime.now().strftime("%H:%M")
-                print(f"[{time_now}] {message}")
+            for msg_type, payload in recv_frames(client, buffer):
+                if msg_type == USERNAME:
+                    send_frame(client, USERNAME, username)
+                else:
+                    # Add a timestamp to incoming messages
+                    time_now = datetime.now().strftime("%H:%M")
+                    print(f"[{time_now}] {text(payload)}")
         except:
             print("\n[!] Lost connection to server.")
             break
@@ -50,13 +55,14 @@ def write_messages():
                 client.close()
                 break
             elif msg == "/help":
-                print("Commands: /quit, /help, /shout")
+                print("Commands: /quit, /help, /shout, /msg user text, /join room, /leave, /rooms, /history user")
                 continue
             elif msg.startswith("/shout "):
                 msg = msg.replace("/shout ", "").upper() + "!! 🔊"
 
-        message = f"{username}: {msg}"
-        client.send(message.encode("utf-8"))
+        # Server commands go as typed; normal chat gets the "name: " prefix
+        message = msg if msg.startswith(("/msg ", "/join", "/leave", "/rooms", "/history")) else f"{username}: {msg}"
+        send_frame(client, TEXT, message)
 
 threading.Thread(target=receive_messages).start() # Start background thread for receiving messages. Allows messages to appear while user types.
 threading.Thread(target=write_messages).start() # Start another thread for sending messages.
\ No newline at end of file
@@ -0,0 +1,278 @@
+# loadgen.py
+
+# A headless load generator for the chat servers (server.py, async_server.py, sharded.py).
+#
+# client.py waits on input(), so it cannot tell us how a server copes with
+# thousands of people. This script opens --clients simulated users from one
+# asyncio event loop, does the USERNAME handshake for each of them, and then
+# has them chat at --rate messages per second in total: a --pm fraction goes
+# out as "/msg someone ...", the rest are broadcasts to the sender's room.
+#
+# Every message carries the time it was sent:
+#
+#   "lg3f9a-17: @3f9a:812345678901234 xxxxxxxx"
+#               ^run  ^perf_counter_ns ^padding up to --size bytes
+#
+# All clients live in this process, so when a copy arrives the receiver
+# subtracts that timestamp from the clock right now and gets the delivery
+# latency. The run id keeps us from timing history replayed from older runs.
+#
+# At the end it prints:
+#   - how fast the clients connected (handshakes per second)
+#   - messages sent and delivered per second (and how many of the expected copies arrived)
+#   - p50 / p99 / p99.9 / max delivery latency
+# With --results FILE the numbers are also appended to a tab-separated file,
+# so a server change can be compared against an earlier baseline.
+#
+# Usage: python loadgen.py [--port 5555] [--clients 1000] [--rate 200] [--pm 0.2] [--rooms 1] [--duration 10]
+# (Start the server first. Thousands of clients need a high open-file limit on both sides.)
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+
+from async_server import HOST, PORT, LOBBY, raise_file_limit
+from protocol import USERNAME, TEXT, FrameBuffer, ProtocolError, frame
+
+PERCENTILES = (50, 99, 99.9)
+# Traffic starts once nothing has arrived for SETTLE seconds: thousands of
+# "joined the chat!" notices can take a while to drain and would skew the timings
+SETTLE = 1.0
+
+
+class Stats:
+    """Counters shared by all simulated clients (one event loop, so no locks)."""
+
+    def __init__(self, marker):
+        self.marker = marker
+        self.latencies = []  # nanoseconds, one per delivered copy
+        self.sent_broadcast = 0
+        self.sent_private = 0
+        self.expected = 0    # copies the server should deliver for what was sent
+        self.received = 0
+        self.received_private = 0
+        self.lost = 0        # connections the server closed on us during the run
+        self.last_frame = 0  # perf_counter_ns of the last recv, to tell when the server has gone quiet
+
+    def delivered(self, payload, now):
+        data = bytes(payload)
+        start = data.find(self.marker)
+        if start < 0:
+            return  # somebody else's chat, or history from an earlier run
+        start += len(self.marker)
+        end = data.find(b" ", start)
+        self.latencies.append(now - int(data[start:end if end >= 0 else len(data)]))
+        self.received += 1
+        if data.startswith(b"[PM from "):
+            self.received_private += 1
+
+
+class SimClient(asyncio.BufferedProtocol):
+    """One simulated user. Reads with the same FrameBuffer as the servers."""
+
+    def __init__(self, name, stats):
+        self.name = name
+        self.stats = stats
+        self.buffer = FrameBuffer()
+        self.transport = None
+        self.room = LOBBY
+        self.stopping = False
+        # Done once the server asked for our name and we answered
+        self.ready = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        return self.buffer.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        # One clock reading per recv: every frame in it arrived at the same moment
+        now = self.stats.last_frame = time.perf_counter_ns()
+        self.buffer.buffer_updated(nbytes)
+        try:
+            for msg_type, payload in self.buffer.frames():
+                if msg_type == TEXT:
+                    self.stats.delivered(payload, now)
+                elif msg_type == USERNAME and not self.ready.done():
+                    self.transport.write(frame(USERNAME, self.name))
+                    self.ready.set_result(None)
+        except ProtocolError:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        if not self.ready.done():
+            self.ready.set_exception(exc or ConnectionError("closed during the handshake"))
+        elif not self.stopping:
+            self.stats.lost += 1
+
+    def send(self, message):
+        if not self.transport.is_closing():
+            self.transport.write(frame(TEXT, message))
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def room_name(index, rooms):
+    return LOBBY if index % rooms == 0 else f"room{index % rooms}"
+
+
+async def connect_all(args, names, stats):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(args.parallel)
+
+    async def connect(name):
+        async with semaphore:
+            client = None
+            try:
+                _, client = await loop.create_connection(lambda: SimClient(name, stats), args.host, args.port)
+                await asyncio.wait_for(client.ready, args.timeout)
+                return client
+            except (OSError, asyncio.TimeoutError) as exc:
+                if client is not None:
+                    client.transport.close()
+                return exc
+
+    tasks = []
+    start = loop.time()
+    for i, name in enumerate(names):
+        if args.connect_rate:
+            # Spread the attempts out instead of opening everything at once
+            await asyncio.sleep(max(0.0, start + i / args.connect_rate - loop.time()))
+        tasks.append(asyncio.ensure_future(connect(name)))
+    results = await asyncio.gather(*tasks)
+    clients = [c for c in results if isinstance(c, SimClient)]
+    errors = [e for e in results if not isinstance(e, SimClient)]
+    return clients, errors
+
+
+async def talk(client, clients, room_sizes, args, stats, stop_at):
+    # Each client sends every `interval` seconds, starting at a random point so they do not all fire together
+    interval = len(clients) / args.rate
+    next_send = time.perf_counter() + random.uniform(0, interval)
+    padding = "x" * args.size
+    while next_send < stop_at:
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        if client.transport.is_closing():
+            return
+        # The timestamp is taken when the message really goes out, so a generator that falls behind
+        # shows up as a lower send rate, not as latency the server did not cause
+        stamp = f"{stats.marker.decode()}{time.perf_counter_ns()} {padding}"
+        if args.pm and len(clients) > 1 and random.random() < args.pm:
+            target = client
+            while target is client:
+                target = random.choice(clients)
+            client.send(f"/msg {target.name} {stamp}")
+            stats.sent_private += 1
+            stats.expected += 1
+        else:
+            client.send(f"{client.name}: {stamp}")
+            stats.sent_broadcast += 1
+            stats.expected += room_sizes[client.room] - 1
+        next_send += interval
+
+
+async def run(args, out=sys.stdout):
+    raise_file_limit()
+    run_id = os.urandom(3).hex()
+    stats = Stats(f"@{run_id}:".encode())
+    names = [f"lg{run_id}-{i}" for i in range(args.clients)]
+
+    # -------- Connect --------
+    started = time.perf_counter()
+    clients, errors = await connect_all(args, names, stats)
+    connect_time = time.perf_counter() - started
+    print(f"Connected {len(clients)}/{args.clients} clients in {connect_time:.2f} s "
+          f"({len(clients) / connect_time:.0f} handshakes/s)", file=out)
+    if errors:
+        print(f"  {len(errors)} failed, first error: {errors[0]!r}", file=out)
+    if not clients:
+        return None
+
+    room_sizes = {}
+    for i, client in enumerate(clients):
+        client.room = room_name(i, args.rooms)
+        room_sizes[client.room] = room_sizes.get(client.room, 0) + 1
+        if client.room != LOBBY:
+            client.send(f"/join {client.room}")
+    while time.perf_counter_ns() - stats.last_frame < SETTLE * 1e9:
+        await asyncio.sleep(SETTLE / 10)
+
+    # -------- Chat --------
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    await asyncio.gather(*(talk(c, clients, room_sizes, args, stats, stop_at) for c in clients))
+    sent_time = time.perf_counter() - started
+    # Give the copies still on their way time to arrive
+    await asyncio.sleep(args.drain)
+    for client in clients:
+        client.stopping = True
+        client.transport.close()
+
+    # -------- Report --------
+    sent = stats.sent_broadcast + stats.sent_private
+    latencies = sorted(stats.latencies)
+    ms = [percentile(latencies, p) / 1e6 for p in PERCENTILES]
+    worst = latencies[-1] / 1e6 if latencies else 0
+    share = stats.received / stats.expected * 100 if stats.expected else 0
+    print(f"Sent {sent} messages in {sent_time:.2f} s ({sent / sent_time:.0f} msg/s): "
+          f"{stats.sent_broadcast} broadcast, {stats.sent_private} private", file=out)
+    print(f"Delivered {stats.received} of {stats.expected} expected copies ({share:.1f}%), "
+          f"{stats.received / sent_time:.0f} msg/s, {stats.received_private} private", file=out)
+    print("Latency " + "  ".join(f"p{p:g} {v:.2f} ms" for p, v in zip(PERCENTILES, ms)) + f"  max {worst:.2f} ms",
+          file=out)
+    if stats.lost:
+        print(f"{stats.lost} connections were closed by the server during the run", file=out)
+
+    result = {
+        "clients": len(clients), "connect_per_s": len(clients) / connect_time,
+        "sent_per_s": sent / sent_time, "delivered_per_s": stats.received / sent_time, "delivered_pct": share,
+        "p50_ms": ms[0], "p99_ms": ms[1], "p999_ms": ms[2], "max_ms": worst, "lost": stats.lost,
+    }
+    if args.results:
+        new = not os.path.exists(args.results)
+        with open(args.results, "a") as results:
+            if new:
+                results.write("label\t" + "\t".join(result) + "\n")
+            results.write(args.label + "\t" + "\t".join(f"{v:.2f}" if isinstance(v, float) else str(v)
+                                                       for v in result.values()) + "\n")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the chat servers")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--connect-rate", type=float, default=0, help="new connections per second (0 = as fast as possible)")
+    parser.add_argument("--parallel", type=int, default=256, help="handshakes in progress at once")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds a handshake may take")
+    parser.add_argument("--rate", type=float, default=200, help="messages per second from all clients together")
+    parser.add_argument("--pm", type=float, default=0.2, help="fraction of messages sent as /msg")
+    parser.add_argument("--rooms", type=int, default=1, help="spread the clients over this many rooms")
+    parser.add_argument("--size", type=int, default=32, help="padding bytes per message")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic")
+    parser.add_argument("--drain", type=float, default=2, help="seconds to wait for late copies")
+    parser.add_argument("--results", help="append the numbers to this tab-separated file")
+    parser.add_argument("--label", default="run", help="name of this run in the results file")
+    args = parser.parse_args(argv)
+    if args.clients < 1 or args.rate <= 0 or args.rooms < 1:
+        parser.error("--clients, --rate and --rooms must be positive")
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
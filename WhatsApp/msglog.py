@@ -0,0 +1,246 @@
+# msglog.py
+
+# Chat history on disk, so people who join can see what was said before.
+#
+# Every room and every private conversation ("thread") gets its own folder
+# of append-only segment files:
+#
+#   chat_history/room-6c6f626279/000000000000.log   the messages, as ready-to-send frames
+#                                000000000000.idx   4 bytes per message: where it starts in the .log
+#                                000000012345.log   next segment, starting at message 12345
+#
+# Messages are only ever added at the end, and a segment is closed once it
+# reaches SEGMENT_BYTES, so no file ever has to be rewritten.
+#
+# Reading the last N messages opens the newest segment with mmap, looks up
+# where message (count - N) starts in the index, and takes everything from
+# there to the end in one slice. The slice is already a run of protocol
+# frames, so it can go to the client in a single send.
+#
+# Writing is "group committed": append() only puts the frame in a queue and
+# returns at once. A background thread takes whatever has piled up, writes
+# it with one write() per file and flushes once per group. The chat path
+# never waits for the disk.
+#
+# Only the MAX_OPEN_SEGMENTS most recently written threads keep their files
+# open; the others are closed and reopened when they are written again, so
+# thousands of conversations never run the server out of file descriptors.
+
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from protocol import HEADER
+
+SEGMENT_BYTES = 8 * 1024 * 1024
+COMMIT_INTERVAL = 0.05  # seconds between group commits; more waiting = bigger, cheaper groups
+MAX_OPEN_SEGMENTS = 64  # each open segment holds two file descriptors
+OFFSET = struct.Struct("<I")
+
+
+def room_thread(room):
+    return f"room-{room.encode('utf-8').hex()}"
+
+
+def dm_thread(user_a, user_b):
+    # Both people read the same conversation, whoever wrote first
+    a, b = sorted((user_a, user_b))
+    return f"dm-{a.encode('utf-8').hex()}-{b.encode('utf-8').hex()}"
+
+
+def segment_name(base):
+    return f"{base:012d}"
+
+
+class LogReader:
+    """Read-only access to a history folder (several processes may read while one writes)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def segments(self, thread):
+        """Base message numbers of the thread's segments, oldest first."""
+        try:
+            names = os.listdir(os.path.join(self.directory, thread))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-4]) for name in names if name.endswith(".log"))
+
+    def tail(self, thread, count):
+        """The last `count` messages of `thread` as a list of byte chunks (frames back to back), oldest first."""
+        folder = os.path.join(self.directory, thread)
+        chunks = []
+        for base in reversed(self.segments(thread)):
+            if count <= 0:
+                break
+            path = os.path.join(folder, segment_name(base))
+            chunk, taken = self._read_segment(path, count)
+            if chunk:
+                chunks.append(chunk)
+            count -= taken
+        chunks.reverse()
+        return chunks
+
+    def _read_segment(self, path, count):
+        # Only messages that are in the index are read: the writer adds the
+        # index entry after the message itself, so those are always complete
+        with open(path + ".idx", "rb") as idx_file, open(path + ".log", "rb") as log_file:
+            indexed = os.fstat(idx_file.fileno()).st_size // OFFSET.size
+            if indexed == 0 or os.fstat(log_file.fileno()).st_size == 0:
+                return b"", 0
+            take = min(count, indexed)
+            with mmap.mmap(idx_file.fileno(), 0, access=mmap.ACCESS_READ) as idx:
+                start = OFFSET.unpack_from(idx, (indexed - take) * OFFSET.size)[0]
+                last = OFFSET.unpack_from(idx, (indexed - 1) * OFFSET.size)[0]
+            with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+                _, length = HEADER.unpack_from(log, last)
+                # Slicing an mmap copies straight from the page cache, with no read() calls
+                return log[start:last + HEADER.size + length], take
+
+
+class Segment:
+    """The open segment of one thread, on the writer side."""
+
+    def __init__(self, folder, base):
+        self.base = base
+        path = os.path.join(folder, segment_name(base))
+        # The index exists before the log, so a reader that finds a .log always finds its .idx
+        self.idx = open(path + ".idx", "ab")
+        try:
+            self.log = open(path + ".log", "ab")
+        except OSError:
+            self.idx.close()
+            raise
+        self.size = self.log.tell()
+        self.count = self.idx.tell() // OFFSET.size
+
+    def close(self):
+        self.log.close()
+        self.idx.close()
+
+
+class MessageLog(LogReader):
+    """A LogReader that also writes: append() queues, a background thread commits in groups."""
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, commit_interval=COMMIT_INTERVAL, fsync=False,
+                 max_open=MAX_OPEN_SEGMENTS):
+        super().__init__(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.max_open = max_open
+        # thread -> Segment, least recently written first (writer thread only)
+        self.open_segments = OrderedDict()
+        self.queue = []
+        self.appended = 0
+        self.committed = 0
+        self.closed = False
+        self.ready = threading.Condition()
+        self.writer = threading.Thread(target=self._run, name="message-log", daemon=True)
+        self.writer.start()
+
+    def append(self, thread, data):
+        """Queues one frame for `thread`; returns immediately."""
+        with self.ready:
+            self.queue.append((thread, data))
+            self.appended += 1
+            self.ready.notify()
+
+    def flush(self):
+        """Waits until everything appended so far is on disk (at least in the OS page cache)."""
+        with self.ready:
+            target = self.appended
+            while self.committed < target:
+                self.ready.wait()
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+        self.writer.join()
+
+    # -------- Writer Thread --------
+
+    def _run(self):
+        while True:
+            with self.ready:
+                while not self.queue and not self.closed:
+                    self.ready.wait()
+                batch, self.queue = self.queue, []
+                if not batch and self.closed:
+                    break
+            grouped = {}
+            for thread, data in batch:
+                grouped.setdefault(thread, []).append(data)
+            for thread, records in grouped.items():
+                try:
+                    self._write(thread, records)
+                except Exception as exc:
+                    # Lose this group, not the writer (out of file descriptors, disk full, a bad thread
+                    # name from the bus...): the next group for this thread reopens its files
+                    print(f"Message log: could not write {len(records)} messages to {thread}: {exc}")
+                    self._forget(thread)
+            with self.ready:
+                self.committed += len(batch)
+                self.ready.notify_all()
+            if self.commit_interval and not self.closed:
+                time.sleep(self.commit_interval)
+        for segment in self.open_segments.values():
+            segment.close()
+
+    def _segment(self, thread):
+        segment = self.open_segments.get(thread)
+        if segment is not None:
+            self.open_segments.move_to_end(thread)
+            return segment
+        while len(self.open_segments) >= self.max_open:
+            _, oldest = self.open_segments.popitem(last=False)
+            oldest.close()
+        folder = os.path.join(self.directory, thread)
+        os.makedirs(folder, exist_ok=True)
+        bases = self.segments(thread)
+        # The .log size and .idx length on disk say where to carry on, so a reopened segment continues exactly
+        segment = self.open_segments[thread] = Segment(folder, bases[-1] if bases else 0)
+        return segment
+
+    def _forget(self, thread):
+        segment = self.open_segments.pop(thread, None)
+        if segment is not None:
+            try:
+                segment.close()
+            except OSError:
+                pass
+
+    def _write(self, thread, records):
+        segment = self._segment(thread)
+        data, offsets = [], []
+        for record in records:
+            if segment.size and segment.size + len(record) > self.segment_bytes:
+                # Segment full: commit what we have to it, then start the next one
+                self._commit(segment, data, offsets)
+                segment.close()
+                folder = os.path.join(self.directory, thread)
+                segment = self.open_segments[thread] = Segment(folder, segment.base + segment.count)
+                data, offsets = [], []
+            offsets.append(segment.size)
+            data.append(record)
+            segment.size += len(record)
+            segment.count += 1
+        self._commit(segment, data, offsets)
+
+    def _commit(self, segment, data, offsets):
+        if not data:
+            return
+        # Messages first, then their index entries, so readers never see an entry for a half-written message
+        segment.log.write(b"".join(data))
+        segment.log.flush()
+        if self.fsync:
+            os.fsync(segment.log.fileno())
+        segment.idx.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        segment.idx.flush()
+        if self.fsync:
+            os.fsync(segment.idx.fileno())
@@ -0,0 +1,73 @@
+# outbox.py
+
+# A bounded queue of frames waiting to be sent to one client.
+#
+# A broadcast only drops the frame into every receiver's outbox, which never
+# blocks; each connection has its own writer that empties its outbox onto the
+# socket. A client that reads slowly (bad WiFi, a stuck program) therefore
+# only fills up its own outbox instead of holding up everyone else.
+#
+# When an outbox is full, the slow-consumer policy decides what happens:
+#   drop-oldest  forget the oldest queued frames to make room (good for chat: the newest matters most)
+#   disconnect   close the connection; the client can reconnect and start fresh
+#   coalesce     replace the whole backlog with one "N messages skipped" notice
+#                followed by the new frame, so the client catches up at once
+
+from collections import deque
+
+from protocol import SYSTEM, frame
+
+DROP_OLDEST = "drop-oldest"
+DISCONNECT = "disconnect"
+COALESCE = "coalesce"
+POLICIES = (DROP_OLDEST, DISCONNECT, COALESCE)
+
+MAX_MESSAGES = 1000
+MAX_BYTES = 1 << 20
+
+
+class SlowConsumer(Exception):
+    """Raised by Outbox.push() under the disconnect policy when the client has fallen too far behind."""
+
+
+class Outbox:
+    def __init__(self, policy=DROP_OLDEST, max_messages=MAX_MESSAGES, max_bytes=MAX_BYTES):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown slow-consumer policy {policy!r}, expected one of {POLICIES}")
+        self.policy = policy
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.queue = deque()
+        self.bytes = 0
+        # Frames thrown away so far because this client could not keep up
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def full_after(self, size):
+        return len(self.queue) + 1 > self.max_messages or self.bytes + size > self.max_bytes
+
+    def push(self, data):
+        if self.full_after(len(data)):
+            if self.policy == DISCONNECT:
+                raise SlowConsumer(f"{len(self.queue)} frames ({self.bytes} bytes) waiting")
+            if self.policy == COALESCE:
+                skipped = len(self.queue)
+                self.dropped += skipped
+                self.queue.clear()
+                notice = frame(SYSTEM, f"System: {skipped} messages skipped, you were falling behind.")
+                self.queue.append(notice)
+                self.bytes = len(notice)
+            while self.queue and self.full_after(len(data)):
+                self.bytes -= len(self.queue.popleft())
+                self.dropped += 1
+        self.queue.append(data)
+        self.bytes += len(data)
+
+    def pop_all(self):
+        """Everything queued as one bytes object, so the writer needs a single send for the batch."""
+        data = b"".join(self.queue)
+        self.queue.clear()
+        self.bytes = 0
+        return data
@@ -0,0 +1,126 @@
+# protocol.py
+
+# The wire format shared by the servers and client.py.
+#
+# TCP is a stream of bytes, not of messages: one recv() can return half a
+# message, or three messages stuck together (so "USERNAME" could arrive
+# glued to the front of a chat line). To know where each message ends,
+# every message is sent as a frame:
+#
+#   +--------+----------------+-----------------------+
+#   | type   | length         | payload               |
+#   | 1 byte | 4 bytes        | `length` bytes, UTF-8 |
+#   +--------+----------------+-----------------------+
+#
+# FrameBuffer reads frames back out. It owns one bytearray that is reused
+# for every read: recv_into() writes straight into it and the payloads
+# handed out are memoryview slices of it, so reading does not create new
+# bytes objects or glue strings together.
+
+import struct
+
+# ">BI" = big-endian ("network order"), 1 unsigned byte + 4-byte unsigned int
+HEADER = struct.Struct(">BI")
+
+# Message types
+USERNAME = 1  # server -> client: "send your name" (empty payload); client -> server: the name
+TEXT = 2      # chat text, both directions
+SYSTEM = 3    # notices from the server ("User not found.", "... joined the chat!")
+
+# Anything bigger is treated as a broken or hostile client
+MAX_PAYLOAD = 1 << 20
+BUFFER_SIZE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def frame(msg_type, payload):
+    """One complete frame, ready for send()/sendall()/write()."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return HEADER.pack(msg_type, len(payload)) + payload
+
+
+def send_frame(sock, msg_type, payload):
+    sock.sendall(frame(msg_type, payload))
+
+
+class FrameBuffer:
+    """Reusable receive buffer that splits a byte stream into frames.
+
+    Typical use with a blocking socket:
+        n = sock.recv_into(buf.get_buffer())
+        buf.buffer_updated(n)
+        for msg_type, payload in buf.frames():
+            ...
+    asyncio.BufferedProtocol calls get_buffer()/buffer_updated() itself.
+    Payloads are memoryviews into the buffer: use them (or copy them)
+    before the next get_buffer() call.
+    """
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+        self.start = 0  # first byte not yet handed out as a frame
+        self.end = 0    # one past the last byte received
+        self.needed = HEADER.size  # bytes the next frame takes, header included
+
+    def get_buffer(self, sizehint=-1):
+        """The free part of the buffer for the next recv_into()."""
+        pending = self.end - self.start
+        if self.start and len(self.data) - self.end < max(self.needed - pending, 1024):
+            # Not enough room left at the end: slide the unread bytes back to the front
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start, self.end = 0, pending
+        if self.needed > len(self.data):
+            # A frame bigger than the whole buffer: move to a larger one (rare, so the copy is fine)
+            data = bytearray(max(self.needed, 2 * len(self.data)))
+            data[:pending] = self.view[self.start:self.end]
+            self.data, self.view = data, memoryview(data)
+            self.start, self.end = 0, pending
+        return self.view[self.end:]
+
+    def buffer_updated(self, nbytes):
+        self.end += nbytes
+
+    def has_frame(self):
+        """True if a complete frame is already waiting, so reading more can wait."""
+        if self.end - self.start < HEADER.size:
+            return False
+        _, length = HEADER.unpack_from(self.view, self.start)
+        return self.end - self.start >= HEADER.size + length
+
+    def frames(self):
+        """Yields (type, payload memoryview) for every complete frame received so far."""
+        view = self.view
+        while self.end - self.start >= HEADER.size:
+            msg_type, length = HEADER.unpack_from(view, self.start)
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"frame of {length} bytes is too large")
+            self.needed = HEADER.size + length
+            if self.end - self.start < self.needed:
+                return
+            body = self.start + HEADER.size
+            self.start = body + length
+            self.needed = HEADER.size
+            yield msg_type, view[body:self.start]
+        if self.start == self.end:
+            # Everything consumed: start again from the front, no copying needed
+            self.start = self.end = 0
+
+
+def recv_frames(sock, buffer):
+    """Returns the frames that are complete, blocking on recv() only if none are waiting yet."""
+    if not buffer.has_frame():
+        nbytes = sock.recv_into(buffer.get_buffer())
+        if nbytes == 0:
+            raise ConnectionError("connection closed")
+        buffer.buffer_updated(nbytes)
+    return buffer.frames()
+
+
+def text(payload):
+    """Payload memoryview -> str."""
+    return str(payload, "utf-8", errors="replace")
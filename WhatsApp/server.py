@@ -2,9 +2,19 @@
 
 #	socket: This module allows your program to communicate over the network (TCP/IP)
 # threading: This allows multiple clients to connect and communicate simultaneously, without freezing the server.
+import os
 import socket
 import threading
 
+# protocol: frames every message (type + length) so one recv() no longer has to be one message.
+from protocol import USERNAME, TEXT, SYSTEM, FrameBuffer, ProtocolError, frame, recv_frames, send_frame, text
+# outbox: a bounded queue of outgoing frames per client (see outbox.py for the policies).
+from outbox import Outbox, SlowConsumer, DROP_OLDEST
+# msglog: chat history on disk, replayed to people when they join a room.
+from msglog import MessageLog, room_thread, dm_thread
+# wordfilter: the blocked-word list (blocklist.txt), checked in one pass per message.
+from wordfilter import WordFilter
+
 
 # HOST: The IP address the server will listen on.
 # "127.0.0.1" means only the local computer can connect.
@@ -15,6 +25,20 @@ import threading
 HOST = "127.0.0.1"   # localhost
 PORT = 5555
 
+# What to do with a client that cannot keep up: "drop-oldest", "disconnect" or "coalesce"
+SLOW_CONSUMER_POLICY = DROP_OLDEST
+
+# Everyone starts in the lobby; /join moves you to another room.
+LOBBY = "lobby"
+
+# HISTORY: how many earlier messages someone sees when entering a room.
+# log: appends go to a background thread that writes them in groups, so logging never slows a broadcast.
+HISTORY = 20
+log = MessageLog(os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_history"))
+
+# word_filter: reloads blocklist.txt by itself when the file is edited, no restart needed.
+word_filter = WordFilter()
+
 # socket.socket(socket.AF_INET, socket.SOCK_STREAM): Creates a TCP/IP socket.
 # AF_INET = IPv4
 # SOCK_STREAM = TCP (reliable connection)
@@ -29,68 +53,212 @@ server.listen()
 # These lists are parallel: clients[i] corresponds to usernames[i].
 clients = []
 usernames = []
+# writers: client socket -> its ClientWriter (the thread that does the actual sending).
+writers = {}
+# rooms: room name -> set of client sockets in it; room_of: client socket -> its room.
+# A message only goes to the sockets in its room, not to everybody in `clients`.
+rooms = {}
+room_of = {}
+# lock: many threads change the lists above, so they take turns.
+lock = threading.Lock()
+
+
+# ClientWriter owns one client's outbox and is the only thread that sends to that socket.
+# send() just queues the frame and wakes the writer up, so it never blocks the caller,
+# however slowly this client reads.
+class ClientWriter(threading.Thread):
+    def __init__(self, client):
+        super().__init__(daemon=True)
+        self.client = client
+        self.outbox = Outbox(SLOW_CONSUMER_POLICY)
+        self.ready = threading.Condition()
+        self.closed = False
+
+    def send(self, data):
+        with self.ready:
+            if self.closed:
+                return
+            try:
+                self.outbox.push(data)
+            except SlowConsumer:
+                # "disconnect" policy: shutting the socket down also ends the client's reading thread
+                self.closed = True
+                try:
+                    self.client.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.ready.notify()
+
+    def stop(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+
+    def run(self):
+        while True:
+            with self.ready:
+                while not self.outbox and not self.closed:
+                    self.ready.wait()
+                if self.closed:
+                    return
+                # Take the whole backlog at once and send it outside the lock
+                data = self.outbox.pop_all()
+            try:
+                self.client.sendall(data)
+            except OSError:
+                remove_client(self.client)
+                return
+
 
 # broadcast is a helper function that sends a message to everyone connected.
 # This is how messages from one user get delivered to all others.
-def broadcast(message, sender_socket=None):
+def broadcast(message, sender_socket=None, msg_type=TEXT, room=LOBBY):
     """
     Improved broadcast:
     1. Optionally skips the sender (so you don't see your own msg twice).
-    2. Handles encoding automatically.
+    2. Builds the frame once and queues the same bytes for everyone in the room.
+    3. Never waits for a slow receiver: each client's own writer does the sending.
     """
-    if isinstance(message, str):
-        message = message.encode("utf-8")
+    data = frame(msg_type, message)
+    if msg_type == TEXT:
+        log.append(room_thread(room), data)
 
-    for client in clients:
-        if client != sender_socket:  # Don't send the message back to the person who wrote it
-            try:
-                client.send(message)
-            except:
-                # Clean up broken connections found during broadcast
-                remove_client(client)
+    with lock:
+        receivers = [writers[client] for client in rooms.get(room, ()) if client != sender_socket]
+    for writer in receivers:  # Don't send the message back to the person who wrote it
+        writer.send(data)
+
+
+# send_to queues one frame for one client.
+def send_to(client, msg_type, message):
+    writer = writers.get(client)
+    if writer is not None:
+        writer.send(frame(msg_type, message))
+
+
+# replay sends the last HISTORY messages of a room or private conversation to one client.
+# Each chunk read from the log holds many frames, so this is one send per chunk, not per message.
+def replay(client, thread):
+    writer = writers.get(client)
+    if writer is not None:
+        for chunk in log.tail(thread, HISTORY):
+            writer.send(chunk)
+
+
+# move_to_room takes a client out of its current room (if any) and puts it in `room`.
+# Call with the lock held. Returns the room it left.
+def move_to_room(client, room):
+    old = room_of.pop(client, None)
+    if old is not None:
+        rooms[old].discard(client)
+        if not rooms[old]:
+            del rooms[old]  # empty rooms disappear
+    if room is not None:
+        rooms.setdefault(room, set()).add(client)
+        room_of[client] = room
+    return old
+
+
+# remove_client forgets a client that left (or whose connection broke) and tells their room.
+def remove_client(client):
+    with lock:
+        if client not in clients:
+            return
+        index = clients.index(client)
+        clients.pop(index)
+        username = usernames.pop(index)
+        writer = writers.pop(client)
+        room = move_to_room(client, None)
+    writer.stop()
+    client.close()
+    broadcast(f"{username} left the chat!", msg_type=SYSTEM, room=room)
 
 #	handle_client(client) handles one client in a separate thread.
 # client.recv(1024): Receives up to 1024 bytes of data from that client.
 # broadcast(message): Sends the received message to all other clients.
-# If there is an error (client disconnects), we:
+# If the connection breaks (client disconnects or sends garbage), we:
 #	1.	Find the client’s index
 #	2.	Remove them from clients and usernames lists
 #	3.	Close the connection
 #	4.	Inform everyone that the user left the chat
 #	5.	Break the loop (stop the thread)
-def handle_client(client):
+# Each client gets one FrameBuffer that every recv_into() reuses;
+# recv_frames() returns only complete messages, however TCP split or merged them.
+def handle_client(client, buffer):
     while True:
         try:
-            message = client.recv(1024).decode("utf-8")
-
-            # FEATURE: Private Messaging Logic
-            # Syntax: /msg username message
-            if message.startswith("/msg"):
-                parts = message.split(" ", 2)
-                target_user = parts[1]
-                content = parts[2]
-
-                if target_user in usernames:
-                    target_index = usernames.index(target_user)
-                    target_socket = clients[target_index]
-                    target_socket.send(f"[PM from {usernames[clients.index(client)]}]: {content}".encode("utf-8"))
-                else:
-                    client.send("System: User not found.".encode("utf-8"))
-
-            # FEATURE: Word Filtering (The "Family Friendly" Filter)
-            elif "badword" in message.lower():
-                client.send("System: Please keep the chat clean!".encode("utf-8"))
-
-            else:
-                broadcast(f"{message}", sender_socket=client)
-        except:
+            for msg_type, payload in recv_frames(client, buffer):
+                if msg_type == TEXT:
+                    handle_message(client, text(payload))
+        except (ConnectionError, OSError, ProtocolError):
             remove_client(client)
             break
 
+
+def handle_message(client, message):
+    # FEATURE: Private Messaging Logic
+    # Syntax: /msg username message
+    if message.startswith("/msg"):
+        parts = message.split(" ", 2)
+        if len(parts) < 3:
+            send_to(client, SYSTEM, "System: Usage: /msg username message")
+            return
+        target_user = parts[1]
+        content = parts[2]
+
+        with lock:
+            target_socket = clients[usernames.index(target_user)] if target_user in usernames else None
+            sender = usernames[clients.index(client)] if client in clients else "?"
+        if target_socket is not None:
+            data = frame(TEXT, f"[PM from {sender}]: {content}")
+            writer = writers.get(target_socket)
+            if writer is not None:
+                writer.send(data)
+            log.append(dm_thread(sender, target_user), data)
+        else:
+            send_to(client, SYSTEM, "System: User not found.")
+
+    # FEATURE: Rooms
+    # Syntax: /join room   /leave (back to the lobby)   /rooms (list them)
+    elif message.startswith("/join") or message.strip() == "/leave":
+        room = message[len("/join"):].strip() if message.startswith("/join") else LOBBY
+        if not room or " " in room:
+            send_to(client, SYSTEM, "System: Usage: /join room")
+            return
+        with lock:
+            username = usernames[clients.index(client)]
+            old = move_to_room(client, room)
+        if old != room:
+            broadcast(f"{username} went to {room}.", msg_type=SYSTEM, room=old)
+            replay(client, room_thread(room))
+            broadcast(f"{username} joined {room}.", msg_type=SYSTEM, room=room)
+
+    # FEATURE: History of a private conversation
+    # Syntax: /history username
+    elif message.startswith("/history"):
+        other = message[len("/history"):].strip()
+        with lock:
+            username = usernames[clients.index(client)]
+        replay(client, dm_thread(username, other))
+
+    elif message.strip() == "/rooms":
+        with lock:
+            listing = ", ".join(f"{name} ({len(members)})" for name, members in sorted(rooms.items()))
+        send_to(client, SYSTEM, f"System: Rooms: {listing}")
+
+    # FEATURE: Word Filtering (The "Family Friendly" Filter)
+    elif word_filter.find(message):
+        send_to(client, SYSTEM, "System: Please keep the chat clean!")
+
+    else:
+        broadcast(message, sender_socket=client, room=room_of.get(client, LOBBY))
+
 # receive_connections() continuously waits for new clients.
 # server.accept(): Pauses until a new client connects, returns a socket for that client and its address.
-# client.send("USERNAME"): Asks the client to send its username.
-# username = client.recv(1024).decode("utf-8"): Receives the username.
+# send_frame(client, USERNAME, ""): Asks the client to send its username.
+# username: read from the client's USERNAME frame.
+# An empty name or one somebody else already uses is refused and the connection closed.
+# ClientWriter(client): Starts the thread that sends everything queued for this client.
 # Adds the client and username to the respective lists.
 # Prints the username for server-side logs.
 # broadcast(f"{username} joined the chat!"): Lets everyone know a new user joined.
@@ -105,16 +273,44 @@ def receive_connections():
         client, address = server.accept()
         print(f"Connected with {address}")
 
-        client.send("USERNAME".encode("utf-8"))
-        username = client.recv(1024).decode("utf-8")
+        buffer = FrameBuffer()
+        username = None
+        try:
+            send_frame(client, USERNAME, "")
+            while username is None:
+                for msg_type, payload in recv_frames(client, buffer):
+                    if msg_type == USERNAME:
+                        username = text(payload)
+                        break
+        except (ConnectionError, OSError, ProtocolError):
+            client.close()
+            continue
 
-        usernames.append(username)
-        clients.append(client)
+        writer = ClientWriter(client)
+        with lock:
+            # Checked and added under one lock, so two people cannot take the same name at once
+            taken = not username or username in usernames
+            if not taken:
+                usernames.append(username)
+                clients.append(client)
+                writers[client] = writer
+                move_to_room(client, LOBBY)
+        if taken:
+            reason = "System: Username already taken." if username else "System: Empty username."
+            try:
+                send_frame(client, SYSTEM, reason)
+            except OSError:
+                pass
+            client.close()
+            continue
+        writer.start()
 
         print(f"Username is {username}")
-        broadcast(f"{username} joined the chat!".encode("utf-8"))
+        replay(client, room_thread(LOBBY))
+        broadcast(f"{username} joined the chat!", msg_type=SYSTEM)
 
-        thread = threading.Thread(target=handle_client, args=(client,))
+        # The buffer goes along: anything the client sent right after its name is already in it
+        thread = threading.Thread(target=handle_client, args=(client, buffer))
         thread.start()
 
 #	Starts the server loop that waits for clients to connect.
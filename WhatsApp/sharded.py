@@ -0,0 +1,344 @@
+# sharded.py
+
+# The asyncio chat server spread over several processes, one per CPU core.
+#
+# One Python process can only use one core (the GIL), so async_server.py
+# stops getting faster once that core is busy. Here:
+#
+#   - N worker processes each run a ChatServer on the SAME port. The
+#     SO_REUSEPORT socket option lets them all listen on it, and the kernel
+#     hands every new connection to one of them, spreading the clients out.
+#   - A hub (in the parent process) connects the workers through a Unix
+#     domain socket. It knows which worker each username lives on.
+#
+#   client --TCP--> worker 1 --Unix socket--> hub --Unix socket--> worker 2 --TCP--> client
+#
+# Broadcast: the worker delivers to its own clients in the room, then sends
+# the finished frame to the hub once; the hub passes it on only to the other
+# workers that have members in that room (workers subscribe to a room when
+# it gets its first local member). Nothing is encoded twice.
+# (/rooms lists the rooms of the worker you are connected to.)
+# /msg: delivered directly if the target is on the same worker, otherwise
+# the hub forwards it to the target's worker (or says "User not found.").
+# Usernames: a worker asks the hub to claim a name before accepting it, so a
+# name stays unique across all workers.
+# History: the hub is the only writer of the message log (workers send it
+# LOG messages); workers read the log files directly to replay history.
+#
+# The bus speaks the same framed protocol as the clients (protocol.py),
+# with its own message types; fields inside a payload are length-prefixed (see FIELD).
+#
+# Usage: python sharded.py [--workers 4] [--port 5555] [--policy drop-oldest] [--log-dir DIR] [--history N]
+#                          [--blocklist FILE]
+# (Every worker watches the blocklist file itself, so an edit reaches all of them.)
+# (SO_REUSEPORT needs Linux or a BSD/macOS kernel.)
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import socket
+import struct
+import sys
+import tempfile
+
+from async_server import ChatServer, HOST, PORT, LOBBY, HISTORY, HISTORY_DIR
+from msglog import LogReader, MessageLog, room_thread
+from outbox import DROP_OLDEST, POLICIES
+from protocol import TEXT, FrameBuffer, ProtocolError, frame, text
+from wordfilter import BLOCKLIST
+
+# Bus message types (client frames use 1-3)
+CLAIM = 16        # worker -> hub: name
+CLAIMED = 17      # hub -> worker: "1" or "0", name
+RELEASE = 18      # worker -> hub: name
+BROADCAST = 19    # both ways: room, sender name, complete client frame
+PRIVATE = 20      # both ways: sender, target, content
+NOT_FOUND = 21    # both ways: sender (whose /msg target does not exist, or left before it arrived)
+SUBSCRIBE = 22    # worker -> hub: room (the worker now has members there)
+UNSUBSCRIBE = 23  # worker -> hub: room (its last member there left)
+LOG = 24          # worker -> hub: history thread, frame to append to the message log
+
+# A bus payload with several fields gives every field but the last a 4-byte length
+# in front; the last one runs to the end. Names, rooms and chat text may contain any
+# character (even "\0"), so no separator byte is safe to split on.
+FIELD = struct.Struct(">I")
+
+
+def pack_fields(*parts):
+    return b"".join(FIELD.pack(len(part)) + part for part in parts[:-1]) + parts[-1]
+
+
+def fields(payload, count):
+    data = bytes(payload)
+    parts = []
+    offset = 0
+    for _ in range(count - 1):
+        (length,) = FIELD.unpack_from(data, offset)
+        offset += FIELD.size
+        parts.append(data[offset:offset + length])
+        offset += length
+    parts.append(data[offset:])
+    return parts
+
+
+class BusLink(asyncio.BufferedProtocol):
+    """One end of a hub <-> worker Unix socket; hands every frame to `handler(link, type, payload)`."""
+
+    def __init__(self, handler, on_lost=None):
+        self.handler = handler
+        self.on_lost = on_lost
+        self.buffer = FrameBuffer()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        return self.buffer.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self.buffer.buffer_updated(nbytes)
+        try:
+            for msg_type, payload in self.buffer.frames():
+                self.handler(self, msg_type, payload)
+        except ProtocolError:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        if self.on_lost:
+            self.on_lost(self)
+
+    def send(self, msg_type, *parts):
+        self.transport.write(frame(msg_type, pack_fields(*parts)))
+
+
+# -----------------------------------
+# Hub
+# -----------------------------------
+
+class Hub:
+    def __init__(self, log=None):
+        self.log = log
+        self.workers = []
+        # username -> BusLink of the worker that client is connected to
+        self.directory = {}
+        # room -> set of BusLinks of the workers with members in it
+        self.rooms = {}
+
+    def link(self):
+        link = BusLink(self.handle, self.lost)
+        self.workers.append(link)
+        return link
+
+    def lost(self, link):
+        self.workers.remove(link)
+        for name in [n for n, owner in self.directory.items() if owner is link]:
+            del self.directory[name]
+        for room in list(self.rooms):
+            self.unsubscribe(link, room)
+
+    def unsubscribe(self, link, room):
+        links = self.rooms.get(room)
+        if links is not None:
+            links.discard(link)
+            if not links:
+                del self.rooms[room]
+
+    def handle(self, link, msg_type, payload):
+        if msg_type == CLAIM:
+            name = bytes(payload)
+            free = name not in self.directory
+            if free:
+                self.directory[name] = link
+            link.send(CLAIMED, b"1" if free else b"0", name)
+        elif msg_type == RELEASE:
+            name = bytes(payload)
+            if self.directory.get(name) is link:
+                del self.directory[name]
+        elif msg_type == BROADCAST:
+            room, _ = fields(payload, 2)
+            data = frame(BROADCAST, payload)  # framed once, written to the other workers in the room
+            for worker in self.rooms.get(room, ()):
+                if worker is not link:
+                    worker.transport.write(data)
+        elif msg_type == SUBSCRIBE:
+            self.rooms.setdefault(bytes(payload), set()).add(link)
+        elif msg_type == UNSUBSCRIBE:
+            self.unsubscribe(link, bytes(payload))
+        elif msg_type == LOG:
+            if self.log is not None:
+                thread, data = fields(payload, 2)
+                self.log.append(text(thread), data)
+        elif msg_type == PRIVATE:
+            sender, target, _ = fields(payload, 3)
+            owner = self.directory.get(target)
+            if owner is None:
+                link.send(NOT_FOUND, sender)
+            else:
+                owner.transport.write(frame(PRIVATE, payload))
+        elif msg_type == NOT_FOUND:
+            # The target left after we forwarded a PRIVATE to its worker: tell the sender's worker
+            owner = self.directory.get(bytes(payload))
+            if owner is not None:
+                owner.transport.write(frame(NOT_FOUND, payload))
+
+    async def serve(self, path):
+        loop = asyncio.get_running_loop()
+        return await loop.create_unix_server(self.link, path)
+
+
+# -----------------------------------
+# Worker
+# -----------------------------------
+
+class ShardWorker(ChatServer):
+    """A ChatServer that shares its port with the other workers and reaches their clients through the hub."""
+
+    def __init__(self, host, port, policy, hub_path, log_dir=None, history=HISTORY, blocklist=BLOCKLIST):
+        # Workers only read the log; writing goes through the hub (see record())
+        super().__init__(host, port, policy, LogReader(log_dir) if log_dir and history else None, history, blocklist)
+        self.hub_path = hub_path
+        self.hub = None
+        # Names waiting for the hub to confirm they are free: name -> Connection
+        self.pending = {}
+
+    # -------- Users --------
+
+    def register(self, connection, username):
+        connection.timeout.cancel()
+        if not username:
+            self.reject(connection, "System: Empty username.")
+        elif username in self.clients or username in self.pending:
+            self.reject(connection, "System: Username already taken.")
+        else:
+            self.pending[username] = connection
+            self.hub.send(CLAIM, username.encode("utf-8"))
+
+    def claimed(self, ok, name):
+        connection = self.pending.pop(name, None)
+        if connection is None or connection.transport.is_closing():
+            # The client left while we were waiting
+            if ok:
+                self.hub.send(RELEASE, name.encode("utf-8"))
+        elif ok:
+            self.accept(connection, name)
+        else:
+            self.reject(connection, "System: Username already taken.")
+
+    def remove(self, connection):
+        username = connection.username
+        registered = username is not None and self.clients.get(username) is connection
+        super().remove(connection)
+        if registered:
+            self.hub.send(RELEASE, username.encode("utf-8"))
+
+    # -------- Routing --------
+
+    def broadcast(self, message, sender=None, msg_type=TEXT, room=LOBBY):
+        data = frame(msg_type, message)
+        if msg_type == TEXT:
+            self.record(room_thread(room), data)
+        self.deliver(data, sender, room)
+        self.hub.send(BROADCAST, room.encode("utf-8"), (sender or "").encode("utf-8"), data)
+
+    def record(self, thread, data):
+        if self.log is not None:
+            self.hub.send(LOG, thread.encode("utf-8"), data)
+
+    def room_opened(self, room):
+        self.hub.send(SUBSCRIBE, room.encode("utf-8"))
+
+    def room_closed(self, room):
+        self.hub.send(UNSUBSCRIBE, room.encode("utf-8"))
+
+    def private_message(self, sender, target, content):
+        if target in self.clients:
+            super().private_message(sender, target, content)
+        else:
+            self.hub.send(PRIVATE, sender.encode("utf-8"), target.encode("utf-8"), content.encode("utf-8"))
+
+    def handle_bus(self, link, msg_type, payload):
+        if msg_type == BROADCAST:
+            room, sender, data = fields(payload, 3)
+            self.deliver(data, text(sender), text(room))
+        elif msg_type == PRIVATE:
+            sender, target, content = (text(part) for part in fields(payload, 3))
+            # The sender is on another worker, and the target may have left since the hub looked it up
+            if not self.deliver_private(sender, target, content):
+                self.hub.send(NOT_FOUND, sender.encode("utf-8"))
+        elif msg_type == CLAIMED:
+            ok, name = fields(payload, 2)
+            self.claimed(ok == b"1", text(name))
+        elif msg_type == NOT_FOUND:
+            connection = self.clients.get(text(payload))
+            if connection is not None:
+                self.system(connection, "System: User not found.")
+
+    # -------- Main Loop --------
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        lost = loop.create_future()
+        _, self.hub = await loop.create_unix_connection(
+            lambda: BusLink(self.handle_bus, lambda link: lost.done() or lost.set_result(None)), self.hub_path)
+        server = await self.listen(reuse_port=True)
+        print(f"Worker {os.getpid()} listening on {self.host}:{self.port}")
+        async with server:
+            # Without the hub this worker cannot route anything, so it stops with it
+            await lost
+
+
+def run_worker(host, port, policy, hub_path, log_dir, history, blocklist):
+    try:
+        asyncio.run(ShardWorker(host, port, policy, hub_path, log_dir, history, blocklist).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+async def run(host, port, workers, policy, log_dir=None, history=HISTORY, blocklist=BLOCKLIST):
+    hub_path = os.path.join(tempfile.mkdtemp(prefix="chat-hub-"), "hub.sock")
+    log = MessageLog(log_dir) if log_dir and history else None
+    hub_server = await Hub(log).serve(hub_path)
+    # "spawn" starts each worker as a fresh interpreter instead of a copy of this running event loop
+    ctx = mp.get_context("spawn")
+    processes = [ctx.Process(target=run_worker, args=(host, port, policy, hub_path, log_dir, history, blocklist),
+                             daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"Server running on {host}:{port} with {workers} workers, hub at {hub_path}")
+    try:
+        async with hub_server:
+            await hub_server.serve_forever()
+    finally:
+        for process in processes:
+            process.terminate()
+        os.unlink(hub_path)
+        os.rmdir(os.path.dirname(hub_path))
+        if log is not None:
+            log.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat server sharded over several processes")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--policy", choices=POLICIES, default=DROP_OLDEST)
+    parser.add_argument("--log-dir", default=HISTORY_DIR, help="where chat history is kept")
+    parser.add_argument("--history", type=int, default=HISTORY, help="messages replayed on join (0 = no history)")
+    parser.add_argument("--blocklist", default=BLOCKLIST, help="file of blocked words, reloaded when it changes")
+    args = parser.parse_args(argv)
+    if not hasattr(socket, "SO_REUSEPORT"):
+        parser.error("this system has no SO_REUSEPORT; use async_server.py instead")
+    try:
+        asyncio.run(run(args.host, args.port, args.workers, args.policy, args.log_dir, args.history,
+                        args.blocklist))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
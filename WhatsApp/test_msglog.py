@@ -0,0 +1,98 @@
+# test_msglog.py
+
+# Run with: python -m pytest -q   (from the WhatsApp folder)
+
+import os
+
+import pytest
+
+from msglog import LogReader, MessageLog, dm_thread, room_thread
+from protocol import TEXT, frame
+
+THREAD = room_thread("lobby")
+
+
+def chat(i):
+    return frame(TEXT, f"message {i}")
+
+
+@pytest.fixture
+def log(tmp_path):
+    # Segments of about three messages, and at most two threads with open files
+    log = MessageLog(tmp_path, segment_bytes=3 * len(chat(0)), commit_interval=0, max_open=2)
+    yield log
+    log.close()
+
+
+def test_tail_of_an_unknown_thread(log):
+    assert log.tail(THREAD, 5) == []
+
+
+def test_tail_returns_the_last_frames(log):
+    frames = [chat(i) for i in range(3)]
+    for data in frames:
+        log.append(THREAD, data)
+    log.flush()
+    assert b"".join(log.tail(THREAD, 2)) == b"".join(frames[1:])
+    assert b"".join(log.tail(THREAD, 10)) == b"".join(frames)
+
+
+def test_segments_rotate(log):
+    frames = [chat(i) for i in range(10)]
+    for data in frames:
+        log.append(THREAD, data)
+    log.flush()
+    assert log.segments(THREAD) == [0, 3, 6, 9]
+    # The tail spans several segments and comes back oldest first, one chunk per segment
+    chunks = log.tail(THREAD, 5)
+    assert len(chunks) == 3
+    assert b"".join(chunks) == b"".join(frames[5:])
+    assert b"".join(log.tail(THREAD, 100)) == b"".join(frames)
+
+
+def test_reopening_after_eviction(log):
+    threads = [room_thread(name) for name in ("a", "b", "c")]
+    frames = {thread: [] for thread in threads}
+    # Writing round-robin to three threads with max_open=2 closes and reopens a segment every time
+    for i in range(8):
+        for thread in threads:
+            data = frame(TEXT, f"{thread} {i}")
+            frames[thread].append(data)
+            log.append(thread, data)
+        log.flush()
+    assert len(log.open_segments) <= 2
+    for thread in threads:
+        assert b"".join(log.tail(thread, 100)) == b"".join(frames[thread])
+        assert b"".join(log.tail(thread, 4)) == b"".join(frames[thread][-4:])
+
+
+def test_a_new_log_carries_on(tmp_path):
+    first = MessageLog(tmp_path, commit_interval=0)
+    first.append(THREAD, chat(0))
+    first.close()
+    second = MessageLog(tmp_path, commit_interval=0)
+    second.append(THREAD, chat(1))
+    second.flush()
+    assert b"".join(second.tail(THREAD, 5)) == chat(0) + chat(1)
+    second.close()
+
+
+def test_reader_sees_what_the_writer_flushed(log, tmp_path):
+    thread = dm_thread("bob", "alice")
+    assert thread == dm_thread("alice", "bob")
+    log.append(thread, chat(0))
+    log.flush()
+    assert LogReader(tmp_path).tail(thread, 1) == [chat(0)]
+
+
+def test_write_error_keeps_the_writer_alive(log, capsys):
+    # "\0" cannot be in a file name, so this group fails to write
+    log.append("bad\0thread", chat(0))
+    log.append(THREAD, chat(1))
+    log.flush()
+    assert "could not write 1 messages to bad" in capsys.readouterr().out
+    assert log.writer.is_alive()
+    log.append(THREAD, chat(2))
+    log.flush()
+    assert b"".join(log.tail(THREAD, 5)) == chat(1) + chat(2)
+    assert os.listdir(log.directory) == [THREAD]
@@ -0,0 +1,83 @@
+# test_outbox.py
+
+# Run with: python -m pytest -q   (from the WhatsApp folder)
+
+import pytest
+
+from outbox import COALESCE, DISCONNECT, DROP_OLDEST, Outbox, SlowConsumer
+from protocol import SYSTEM, TEXT, FrameBuffer, frame, text
+
+
+def messages(data):
+    """The (type, text) of every frame in a pop_all() result."""
+    buf = FrameBuffer()
+    target = buf.get_buffer()
+    target[:len(data)] = data
+    buf.buffer_updated(len(data))
+    return [(msg_type, text(payload)) for msg_type, payload in buf.frames()]
+
+
+def chat(i):
+    return frame(TEXT, f"message {i}")
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Outbox("block")
+
+
+def test_within_limits_keeps_everything():
+    box = Outbox(DISCONNECT, max_messages=3)
+    for i in range(3):
+        box.push(chat(i))
+    assert len(box) == 3
+    assert messages(box.pop_all()) == [(TEXT, f"message {i}") for i in range(3)]
+    assert len(box) == 0 and box.bytes == 0 and box.dropped == 0
+
+
+def test_drop_oldest_by_count():
+    box = Outbox(DROP_OLDEST, max_messages=3)
+    for i in range(5):
+        box.push(chat(i))
+    assert box.dropped == 2
+    assert messages(box.pop_all()) == [(TEXT, "message 2"), (TEXT, "message 3"), (TEXT, "message 4")]
+
+
+def test_drop_oldest_by_bytes():
+    size = len(chat(0))
+    box = Outbox(DROP_OLDEST, max_bytes=2 * size)
+    for i in range(4):
+        box.push(chat(i))
+    assert box.bytes == 2 * size
+    assert box.dropped == 2
+    assert messages(box.pop_all()) == [(TEXT, "message 2"), (TEXT, "message 3")]
+
+
+def test_disconnect_raises_and_keeps_the_queue():
+    box = Outbox(DISCONNECT, max_messages=2)
+    box.push(chat(0))
+    box.push(chat(1))
+    with pytest.raises(SlowConsumer):
+        box.push(chat(2))
+    assert box.dropped == 0
+    assert messages(box.pop_all()) == [(TEXT, "message 0"), (TEXT, "message 1")]
+
+
+def test_disconnect_by_bytes():
+    box = Outbox(DISCONNECT, max_bytes=100)
+    with pytest.raises(SlowConsumer):
+        box.push(frame(TEXT, "x" * 200))
+
+
+def test_coalesce_replaces_the_backlog():
+    box = Outbox(COALESCE, max_messages=3)
+    for i in range(4):
+        box.push(chat(i))
+    assert box.dropped == 3
+    assert messages(box.pop_all()) == [
+        (SYSTEM, "System: 3 messages skipped, you were falling behind."),
+        (TEXT, "message 3"),
+    ]
+    # Once emptied the outbox fills normally again
+    box.push(chat(4))
+    assert messages(box.pop_all()) == [(TEXT, "message 4")]
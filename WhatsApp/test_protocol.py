@@ -0,0 +1,82 @@
+# test_protocol.py
+
+# Run with: python -m pytest -q   (from the WhatsApp folder)
+
+import socket
+
+import pytest
+
+from protocol import (MAX_PAYLOAD, HEADER, SYSTEM, TEXT, USERNAME, FrameBuffer, ProtocolError,
+                      frame, recv_frames, text)
+
+
+def feed(buf, data):
+    """Writes `data` into the buffer the way recv_into() would; returns the frames it completed."""
+    target = buf.get_buffer()
+    target[:len(data)] = data
+    buf.buffer_updated(len(data))
+    return [(msg_type, bytes(payload)) for msg_type, payload in buf.frames()]
+
+
+def test_frame_split_across_reads():
+    buf = FrameBuffer(size=64)
+    data = frame(TEXT, "hello there")
+    assert feed(buf, data[:3]) == []           # not even a whole header
+    assert feed(buf, data[3:8]) == []          # header and part of the payload
+    assert feed(buf, data[8:]) == [(TEXT, b"hello there")]
+
+
+def test_several_frames_in_one_read():
+    buf = FrameBuffer()
+    data = frame(USERNAME, "alice") + frame(TEXT, "hi") + frame(SYSTEM, "") + frame(TEXT, "bye")[:4]
+    assert feed(buf, data) == [(USERNAME, b"alice"), (TEXT, b"hi"), (SYSTEM, b"")]
+    assert feed(buf, frame(TEXT, "bye")[4:]) == [(TEXT, b"bye")]
+
+
+def test_frame_larger_than_the_buffer():
+    buf = FrameBuffer(size=1024)
+    payload = "x" * 5000
+    data = frame(TEXT, payload)
+    received = []
+    for i in range(0, len(data), 1000):
+        received += feed(buf, data[i:i + 1000])
+    assert received == [(TEXT, payload.encode())]
+
+
+def test_unicode_payload():
+    buf = FrameBuffer()
+    [(_, payload)] = feed(buf, frame(TEXT, "Grüße 👋"))
+    assert text(payload) == "Grüße 👋"
+
+
+def test_oversized_frame_is_rejected():
+    buf = FrameBuffer()
+    with pytest.raises(ProtocolError):
+        feed(buf, HEADER.pack(TEXT, MAX_PAYLOAD + 1))
+
+
+def test_frames_left_over_after_the_handshake():
+    # The client sends its name and first messages in one go: they arrive in one recv(),
+    # and recv_frames() must hand them out without blocking on another read
+    server, client = socket.socketpair()
+    try:
+        server.settimeout(1)
+        client.sendall(frame(USERNAME, "alice") + frame(TEXT, "one") + frame(TEXT, "two"))
+        buf = FrameBuffer()
+
+        # The handshake reads only the first frame and leaves the rest in the buffer
+        frames = recv_frames(server, buf)
+        msg_type, payload = next(frames)
+        assert (msg_type, text(payload)) == (USERNAME, "alice")
+        assert buf.has_frame()
+
+        # No more bytes are sent: blocking on recv() here would time out
+        assert [(t, text(p)) for t, p in recv_frames(server, buf)] == [(TEXT, "one"), (TEXT, "two")]
+        assert not buf.has_frame()
+
+        client.close()
+        with pytest.raises(ConnectionError):
+            recv_frames(server, buf)
+    finally:
+        server.close()
+        client.close()
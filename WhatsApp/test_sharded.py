@@ -0,0 +1,22 @@
+# test_sharded.py
+
+# Run with: python -m pytest -q   (from the WhatsApp folder)
+
+from protocol import TEXT, frame
+from sharded import fields, pack_fields
+
+
+def test_fields_round_trip():
+    data = frame(TEXT, "a\0b")
+    assert fields(pack_fields(b"lobby", b"alice", data), 3) == [b"lobby", b"alice", data]
+
+
+def test_fields_may_contain_nul():
+    # A room or user name with "\0" in it must not shift the other fields
+    assert fields(pack_fields(b"ro\0om", b"\0", b"x\0y"), 3) == [b"ro\0om", b"\0", b"x\0y"]
+    assert fields(pack_fields(b"", b"bob"), 2) == [b"", b"bob"]
+
+
+def test_single_field_is_the_payload():
+    assert pack_fields(b"alice") == b"alice"
+    assert fields(memoryview(b"alice"), 1) == [b"alice"]
@@ -0,0 +1,75 @@
+# test_wordfilter.py
+
+# Run with: python -m pytest -q   (from the WhatsApp folder)
+
+import os
+import time
+
+from wordfilter import BLOCKLIST, Automaton, WordFilter
+
+
+def test_overlapping_words():
+    automaton = Automaton(["*he*", "*she*", "*hers*"])
+    assert len(automaton) == 3
+    # "she" and "he" end at the same letter; the longer word, found through the trie itself, comes first
+    assert automaton.find("ushers") == "she"
+    assert automaton.find("hers") == "he"
+    assert Automaton(["*hers*"]).find("ushers") == "hers"
+    assert Automaton(["*she*", "*hers*"]).find("xhers") == "hers"
+    assert automaton.find("nothing to see") is None
+
+
+def test_whole_words_only():
+    automaton = Automaton(["ass", "bad*"])
+    assert automaton.find("first class") is None
+    assert automaton.find("you ass!") == "ass"
+    assert automaton.find("ass") == "ass"
+    assert automaton.find("badly done") == "bad"
+    assert automaton.find("notbad") is None
+    assert automaton.find("under_score_ass") is None
+
+
+def test_case_folding():
+    automaton = Automaton(["Strasse", "ÉCOLE"])
+    assert automaton.find("die STRASSE") == "strasse"
+    assert automaton.find("die Straße") == "strasse"
+    assert automaton.find("école") == "école"
+
+
+def test_empty_list_and_wildcard_only():
+    assert Automaton([]).find("anything") is None
+    assert len(Automaton(["*", "**"])) == 0
+
+
+def test_default_blocklist_blocks_substrings():
+    word_filter = WordFilter(BLOCKLIST, reload_interval=0)
+    assert word_filter.find("a BADWORD here") == "badword"
+    assert word_filter.find("notbadwords") == "badword"
+    assert word_filter.find("bad word") is None
+
+
+def test_missing_file_blocks_nothing(tmp_path):
+    word_filter = WordFilter(str(tmp_path / "none.txt"), reload_interval=0)
+    assert word_filter.find("badword") is None
+
+
+def test_hot_reload(tmp_path):
+    path = tmp_path / "blocklist.txt"
+    path.write_text("# comment\nfoo\n", encoding="utf-8")
+    word_filter = WordFilter(str(path), reload_interval=0.05)
+    try:
+        assert word_filter.find("foo bar") == "foo"
+
+        path.write_text("bar  # trailing comment\n", encoding="utf-8")
+        # Make sure the modification time changes even on a coarse-grained file system
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        deadline = time.monotonic() + 5
+        while word_filter.find("foo bar") != "bar" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert word_filter.find("foo bar") == "bar"
+        assert word_filter.find("foo") is None
+        # Nothing changed since: no rebuild
+        assert not word_filter.reload()
+    finally:
+        word_filter.close()
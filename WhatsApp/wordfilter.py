@@ -0,0 +1,162 @@
+# wordfilter.py
+
+# The "family friendly" filter: finds blocked words in a message.
+#
+# Checking `word in message` once per blocked word costs (number of words) x
+# (message length), which is fine for one word and far too slow for
+# thousands. Instead all the words are compiled into one Aho-Corasick
+# automaton: a trie of the words plus "fail" links that say where to continue
+# when the next character does not fit. The message is then read once, one
+# character at a time, however many words there are.
+#
+#   words "he", "she", "hers":       (root) -h-> h -e-> he*  -r-> her -s-> hers*
+#                                     (root) -s-> s -h-> sh -e-> she*
+#   fail links: sh -> h, she -> he   (after "she" we have also just read "he")
+#
+# Matching ignores case (str.casefold, which also handles things like "ß" = "ss")
+# and respects word boundaries, so "class" is not caught by "ass". A "*" at
+# either end of a word drops the boundary on that side:
+#
+#   badword     only the whole word ("badword!", not "badwords")
+#   badword*    also words that start with it ("badwords")
+#   *badword*   anywhere, even inside other words
+#
+# The list lives in a text file (one word per line, "#" starts a comment).
+# A small background thread checks the file's modification time every
+# RELOAD_INTERVAL seconds and rebuilds the automaton when it changed, so the
+# list can be edited while the server runs and checking a message never
+# waits for a rebuild. The new automaton replaces the old one in a single
+# assignment, so a message is always checked against one complete list.
+
+import os
+import threading
+
+BLOCKLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blocklist.txt")
+RELOAD_INTERVAL = 2.0  # seconds between checks of the file's modification time
+WILDCARD = "*"
+
+
+def is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class Automaton:
+    """The compiled word list. Immutable once built, so any number of threads can scan with it."""
+
+    def __init__(self, words):
+        # Node 0 is the root. goto[node] maps a character to the next node;
+        # out[node] lists (length, left boundary?, right boundary?) of the words ending there
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        self.words = 0
+        for word in words:
+            self._add(word)
+        self._link()
+
+    def __len__(self):
+        return self.words
+
+    def _add(self, word):
+        left = not word.startswith(WILDCARD)
+        right = not word.endswith(WILDCARD)
+        word = word.strip(WILDCARD).casefold()
+        if not word:
+            return
+        node = 0
+        for char in word:
+            following = self.goto[node].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[node][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            node = following
+        self.out[node] += ((len(word), left, right),)
+        self.words += 1
+
+    def _link(self):
+        # Breadth first, so a node's fail target (always shallower) is finished before the node
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                target = self.fail[node]
+                while target and char not in self.goto[target]:
+                    target = self.fail[target]
+                self.fail[child] = self.goto[target].get(char, 0)
+                # Words that end at the fail target also end here ("she" contains "he")
+                self.out[child] += self.out[self.fail[child]]
+                queue.append(child)
+
+    def find(self, message):
+        """The first blocked word in `message` (as written there, case folded), or None."""
+        folded = message.casefold()
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for end, char in enumerate(folded):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, left, right in out[node]:
+                start = end - length + 1
+                if left and start > 0 and is_word_char(folded[start - 1]):
+                    continue
+                if right and end + 1 < len(folded) and is_word_char(folded[end + 1]):
+                    continue
+                return folded[start:end + 1]
+        return None
+
+
+def read_words(path):
+    words = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            word = line.split("#", 1)[0].strip()
+            if word:
+                words.append(word)
+    return words
+
+
+class WordFilter:
+    """A blocklist file compiled into an Automaton, rebuilt in the background when the file changes."""
+
+    def __init__(self, path=BLOCKLIST, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.automaton = Automaton(())
+        self.mtime = None
+        self.lock = threading.Lock()  # only one thread rebuilds at a time
+        self.closed = threading.Event()
+        self.reload()
+        if reload_interval:
+            threading.Thread(target=self._watch, name="blocklist", daemon=True).start()
+
+    def reload(self):
+        """Re-reads the file if it changed. Returns True if a new list was loaded."""
+        with self.lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self.mtime:
+                return False
+            # Noted before reading, so a broken file is reported once, not every interval
+            self.mtime = mtime
+            self.automaton = Automaton(read_words(self.path) if mtime is not None else [])
+            print(f"Blocklist: {len(self.automaton)} words from {self.path}")
+            return True
+
+    def _watch(self):
+        while not self.closed.wait(self.reload_interval):
+            try:
+                self.reload()
+            except (OSError, UnicodeDecodeError) as exc:
+                print(f"Blocklist: keeping the old list, could not read {self.path}: {exc}")
+
+    def close(self):
+        self.closed.set()
+
+    def find(self, message):
+        """The first blocked word in `message`, or None."""
+        return self.automaton.find(message)